@@ -15,6 +15,58 @@ class Settings(BaseSettings):
     MONGODB_URL: str
     MONGODB_DB_NAME: str
 
+    # Audio: bitrate (kbps) o VBR cuando hay que transcodificar
+    AUDIO_BITRATE_KBPS: int = 192
+    AUDIO_VBR: bool = False
+    AUDIO_VBR_QUALITY: int = 2  # escala de LAME (0 = mejor, 9 = peor)
+
+    # Audio: normalización de sonoridad (loudnorm, EBU R128)
+    LOUDNORM_I: float = -16.0
+    LOUDNORM_TP: float = -1.5
+    LOUDNORM_LRA: float = 11.0
+
+    # FFmpeg: límites de ejecución
+    FFMPEG_TIMEOUT_SECONDS: int = 3600    # reloj; 0 = sin límite
+    FFMPEG_CPU_SECONDS: int = 14400       # CPU total (suma de hilos); 0 = sin límite
+    FFMPEG_NICE: int = 10
+    FFMPEG_MAX_MEMORY_MB: int = 0         # RLIMIT_AS; 0 = sin límite
+    FFMPEG_STDERR_TAIL_LINES: int = 200
+
+    # Trabajos de descarga: checkpoints y reanudación tras reinicios
+    JOB_LEASE_SECONDS: int = 60          # sin heartbeat durante este tiempo → reanudable
+    JOB_RESUME_INTERVAL_SECONDS: int = 30
+    JOB_CHECKPOINT_INTERVAL_SECONDS: float = 5.0
+    JOB_MAX_ATTEMPTS: int = 3
+
+    # Planificador: prioridades (interactive/bulk) y reparto justo por cliente
+    SCHEDULER_MAX_CONCURRENT_JOBS: int = 4
+    SCHEDULER_INTERACTIVE_RESERVED: int = 1       # slots que bulk no puede ocupar
+    SCHEDULER_INTERACTIVE_MAX_COST: float = 50.0  # MB estimados
+    SCHEDULER_DEFAULT_COST: float = 100.0         # MB si no hay duración ni tamaño
+    SCHEDULER_AUDIO_MB_PER_SECOND: float = 0.025
+    SCHEDULER_VIDEO_MB_PER_SECOND: float = 0.5
+    SCHEDULER_CLIENT_WEIGHTS: dict[str, float] = {}
+    SCHEDULER_INFO_CACHE_SECONDS: float = 900.0   # vida de los datos de /info para el coste
+    SCHEDULER_INFO_CACHE_SIZE: int = 1024
+
+    # Pools de threads para trabajo bloqueante (app/core/executors.py)
+    EXTRACT_EXECUTOR_WORKERS: int = 16
+    DOWNLOAD_EXECUTOR_WORKERS: int = 8
+    IO_EXECUTOR_WORKERS: int = 4
+
+    # Monitor de lag del event loop (app/core/loop_monitor.py)
+    LOOP_LAG_THRESHOLD_MS: float = 100.0
+    LOOP_MONITOR_INTERVAL_MS: float = 50.0
+
+    # Descargas con varias conexiones y peticiones Range (app/services/range_downloader.py)
+    RANGE_DOWNLOAD_ENABLED: bool = True
+    RANGE_DOWNLOAD_CONNECTIONS: int = 4           # por descarga
+    RANGE_DOWNLOAD_MAX_CONNECTIONS: int = 16      # en todo el proceso (pool "range")
+    RANGE_DOWNLOAD_INITIAL_CHUNK_MB: float = 4.0
+    RANGE_DOWNLOAD_MIN_CHUNK_MB: float = 1.0
+    RANGE_DOWNLOAD_MAX_CHUNK_MB: float = 32.0
+    RANGE_DOWNLOAD_TARGET_CHUNK_SECONDS: float = 2.0
+
     # CORS
     ALLOWED_ORIGINS: list[str] = ["http://localhost:5173"]
 
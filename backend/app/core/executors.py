@@ -0,0 +1,75 @@
+"""
+app/core/executors.py
+Pools de threads dimensionados para sacar trabajo bloqueante del event loop.
+
+Se separan por tipo de carga para que una no deje sin hilos a otra:
+- extract:  yt-dlp extract_info (endpoint /info, resolución de formatos).
+- download: descargas de yt-dlp (larguísimas, bloquean un hilo por minutos).
+- io:       operaciones de disco (listdir, move, remove).
+- range:    conexiones de app/services/range_downloader.py (tope de
+            conexiones HTTP simultáneas de todo el proceso).
+
+No se usa el pool por defecto de asyncio (asyncio.to_thread), que es
+compartido y se agota con unas pocas descargas largas.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, TypeVar
+from .config import settings
+
+T = TypeVar("T")
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+# get_executor se llama también desde hilos (range_downloader): sin el lock
+# podrían crearse dos pools "range" y el tope del proceso se duplicaría
+_lock = threading.Lock()
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """Devuelve (creándolo si hace falta) el pool `name`."""
+    executor = _executors.get(name)
+    if executor is not None:
+        return executor
+    with _lock:
+        if name not in _executors:
+            sizes = {
+                "extract": settings.EXTRACT_EXECUTOR_WORKERS,
+                "download": settings.DOWNLOAD_EXECUTOR_WORKERS,
+                "io": settings.IO_EXECUTOR_WORKERS,
+                "range": settings.RANGE_DOWNLOAD_MAX_CONNECTIONS,
+            }
+            _executors[name] = ThreadPoolExecutor(max_workers=sizes[name], thread_name_prefix=f"l2v-{name}")
+        return _executors[name]
+
+
+async def _run(name: str, fn: Callable[..., T], *args, **kwargs) -> T:
+    # Igual que asyncio.to_thread: propaga los contextvars al hilo
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(name), call)
+
+
+async def run_extract(fn: Callable[..., T], *args, **kwargs) -> T:
+    return await _run("extract", fn, *args, **kwargs)
+
+
+async def run_download(fn: Callable[..., T], *args, **kwargs) -> T:
+    return await _run("download", fn, *args, **kwargs)
+
+
+async def run_io(fn: Callable[..., T], *args, **kwargs) -> T:
+    return await _run("io", fn, *args, **kwargs)
+
+
+def shutdown_executors() -> None:
+    """Cierra los pools (shutdown de la app). No espera a las tareas en curso."""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
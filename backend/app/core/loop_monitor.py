@@ -0,0 +1,90 @@
+"""
+app/core/loop_monitor.py
+Monitor de retraso (lag) del event loop.
+
+Una tarea del loop marca un latido cada LOOP_MONITOR_INTERVAL_MS. Un hilo
+vigilante comprueba el latido: si pasa más de LOOP_LAG_THRESHOLD_MS sin
+latir, algún callback está bloqueando el loop. En ese momento toma la
+pila del hilo del loop y reporta el punto de llamada responsable (la
+última línea de código de la app y la función que bloquea), una vez por
+bloqueo y con su duración total al terminar.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from typing import Dict, Optional
+from .config import settings
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _call_site(frame) -> str:
+    """Resume la pila: último frame de la app → frame más interno."""
+    stack = traceback.extract_stack(frame)
+    app_frames = [f for f in stack if f.filename.startswith(_APP_DIR)]
+    innermost = stack[-1]
+    where = f"{innermost.filename}:{innermost.lineno} in {innermost.name}"
+    if app_frames and app_frames[-1] is not innermost:
+        site = app_frames[-1]
+        return f"{site.filename}:{site.lineno} in {site.name} → {where}"
+    return where
+
+
+class LoopLagMonitor:
+    def __init__(self, threshold_ms: float, interval_ms: float):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.max_lag_ms = 0.0
+        self.stalls = 0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def _beat(self) -> None:
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self) -> None:
+        stalled_since: Optional[float] = None
+        while not self._stop.wait(self.interval):
+            lag = time.monotonic() - self._last_beat - self.interval
+            if lag > self.threshold:
+                if stalled_since is None:
+                    stalled_since = self._last_beat
+                    self.stalls += 1
+                    frame = sys._current_frames().get(self._loop_thread_id)
+                    site = _call_site(frame) if frame else "desconocido"
+                    print(f"⚠️ Event loop bloqueado >{self.threshold * 1000:.0f}ms en {site}")
+            elif stalled_since is not None:
+                blocked_ms = (self._last_beat - stalled_since) * 1000
+                self.max_lag_ms = max(self.max_lag_ms, blocked_ms)
+                print(f"⚠️ Event loop bloqueado durante {blocked_ms:.0f}ms")
+                stalled_since = None
+
+    def start(self) -> None:
+        """Iniciar desde el event loop (startup de la app)."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._beat())
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="l2v-loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+
+    def stats(self) -> Dict[str, float]:
+        return {"stalls": self.stalls, "max_lag_ms": round(self.max_lag_ms, 1)}
+
+
+# Instancia global del monitor
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_THRESHOLD_MS, settings.LOOP_MONITOR_INTERVAL_MS)
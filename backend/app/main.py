@@ -5,14 +5,18 @@ Punto de entrada del backend Link2Video.
 Inicia FastAPI, configura CORS, eventos y registra routers.
 """
 
+import asyncio
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 # Importaciones locales
 from app.core.config import settings
+from app.core.executors import shutdown_executors
+from app.core.loop_monitor import loop_monitor
 from app.database.connection import connect_to_mongo, close_mongo_connection
 from app.routers import video_info_router, video_download_router 
+from app.services.download_service import resume_pending_jobs
 
 #  Inicialización de la app
 app = FastAPI(
@@ -42,6 +46,25 @@ async def startup_db():
 async def shutdown_db():
     await close_mongo_connection()
 
+#  Reanudación de trabajos interrumpidos (checkpoints en MongoDB)
+@app.on_event("startup")
+async def startup_jobs():
+    app.state.resume_task = asyncio.create_task(resume_pending_jobs())
+
+@app.on_event("shutdown")
+async def shutdown_jobs():
+    app.state.resume_task.cancel()
+
+#  Monitor de bloqueos del event loop y pools de threads
+@app.on_event("startup")
+async def startup_loop_monitor():
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown_runtime():
+    loop_monitor.stop()
+    shutdown_executors()
+
 #  Registro de routers
 app.include_router(video_info_router.router, prefix="/api/video", tags=["Video"])
 app.include_router(video_download_router.router, prefix="/api/video", tags=["Video"])
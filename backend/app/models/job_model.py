@@ -0,0 +1,51 @@
+"""
+app/models/job_model.py
+--------------------------------
+Modelo del checkpoint de un trabajo de descarga, almacenado
+en la colección "jobs" de MongoDB.
+"""
+
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List, Any
+from datetime import datetime
+import uuid
+
+
+class JobModel(BaseModel):
+    """
+    Estado persistido de un trabajo de descarga/conversión.
+    Permite reanudarlo tras un reinicio del proceso.
+    """
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex, alias="_id")
+
+    # Parámetros de la petición
+    url: str
+    format: str
+    quality: str
+    normalize: bool = False
+    embed_metadata: bool = False
+
+    # Planificación (app/services/scheduler.py)
+    client_id: str = "anonymous"
+    priority: str = "interactive"             # interactive | bulk
+    cost: float = 0.0                         # MB estimados
+
+    # Progreso
+    status: str = "pending"                   # pending | running | done | failed | cancelled
+    filename_base: str = ""
+    resolved_format: Optional[str] = None     # format_id elegido por yt-dlp (ej: "137+140")
+    stages: List[str] = []                    # etapas completadas
+    parts: List[Dict[str, Any]] = []          # [{ "file": "temp_x.f137.mp4.part", "bytes": 1234 }]
+    info: Dict[str, Any] = {}                 # subconjunto de metadatos de yt-dlp
+    sources: List[str] = []                   # archivos descargados (uno por formato)
+    filename: Optional[str] = None
+    content_hash: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+
+    heartbeat_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Config:
+        populate_by_name = True
@@ -14,13 +14,16 @@ class VideoModel(BaseModel):
     """
     Representa los metadatos de un video procesado.
     """
-    id: Optional[str] = Field(alias="_id")
+    id: Optional[str] = Field(None, alias="_id")
     title: str
     filename: str
     format: str
     quality: str
     platform: str
     download_url: str
+    content_hash: Optional[str] = None   # blob en store/ (app/services/media_store.py)
+    size_bytes: Optional[int] = None
+    job_id: Optional[str] = None         # trabajo que lo generó (inserción idempotente)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Config:
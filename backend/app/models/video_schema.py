@@ -34,6 +34,8 @@ class VideoResponse(BaseModel):
     quality: str
     platform: str
     download_url: str
+    content_hash: Optional[str] = None
+    size_bytes: Optional[int] = None
     created_at: datetime
 
     class Config:
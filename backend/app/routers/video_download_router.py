@@ -4,11 +4,13 @@ app/routers/video_download_router.py
 Endpoint para procesar/convertir  y descargar el video.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, HttpUrl, Field
-from typing import Optional
-from app.services.download_service import download_and_convert
+from typing import Optional, Literal
+from app.services.download_service import download_and_convert, CLIENT_GONE
+from app.core.executors import run_io
 from fastapi.responses import FileResponse
+import asyncio
 import os
 
 router = APIRouter()
@@ -24,20 +26,59 @@ class DownloadRequest(BaseModel):
     url: HttpUrl
     format: Optional[str] = Field("mp4", description="Formato de salida (mp4, mp3, webm, m4a, etc.)")
     quality: Optional[str] = Field("1080p", description="Calidad deseada (720p, 1080p, 4k, etc.)")
+    normalize: Optional[bool] = Field(False, description="Solo audio: normalizar sonoridad (loudnorm)")
+    embed_metadata: Optional[bool] = Field(False, description="Solo audio: incrustar metadatos y portada")
+    # Pistas para el planificador: solo pueden bajar la prioridad. El coste
+    # real se calcula en el servidor con lo que extrajo /api/video/info
+    priority: Optional[Literal["interactive", "bulk"]] = Field(None, description="Clase de prioridad (por defecto según el coste)")
+    duration: Optional[float] = Field(None, description="Duración en segundos")
+    size_bytes: Optional[int] = Field(None, description="Tamaño estimado del formato elegido")
+
+async def _run_while_connected(request: Request, coro, poll_seconds: float = 1.0):
+    """
+    Ejecuta `coro` y la cancela si el cliente se desconecta, para que
+    yt-dlp/FFmpeg no sigan ocupando CPU por un resultado que nadie espera.
+    """
+    task = asyncio.create_task(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_seconds)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel(CLIENT_GONE)
+                raise HTTPException(status_code=499, detail="Cliente desconectado.")
+    finally:
+        if not task.done():
+            task.cancel()
+
+def _client_id(request: Request) -> str:
+    # Identificador para el reparto justo: la IP del cliente. La API no tiene
+    # autenticación, así que una cabecera (X-Client-Id) se podría falsear para
+    # obtener una cuota nueva en cada petición
+    return request.client.host if request.client else "anonymous"
 
 # Endpoint para iniciar la descarga y conversión del video
 @router.post("/download")
-async def download(req: DownloadRequest):
+async def download(req: DownloadRequest, request: Request):
     try:
         # 1. Procesamos el video (usando el servicio actualizado)
-        result = await download_and_convert(str(req.url), req.format, req.quality)
+        result = await _run_while_connected(request, download_and_convert(
+            str(req.url), req.format, req.quality,
+            normalize=bool(req.normalize),
+            embed_metadata=bool(req.embed_metadata),
+            client_id=_client_id(request),
+            priority=req.priority,
+            duration=req.duration,
+            size_bytes=req.size_bytes,
+        ))
         
         # 2. Obtenemos la ruta real del archivo generado
         filename = result["filename"]
         file_path = os.path.join(DOWNLOAD_DIR, filename)
         
         # Validación de seguridad: Asegurar que el archivo exista
-        if not os.path.exists(file_path):
+        if not await run_io(os.path.exists, file_path):
              raise HTTPException(status_code=500, detail="Error de servidor: Archivo no encontrado después de la descarga.")
         
         # 3. Devolvemos el ARCHIVO directamente
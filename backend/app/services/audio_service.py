@@ -0,0 +1,224 @@
+"""
+app/services/audio_service.py
+-------------------------------------------
+Pipeline de audio por etapas para descargas de solo audio.
+
+Etapas (cada una independiente y lo más barata posible):
+1. extract:   copia directa del stream (sin re-codificar) cuando el códec
+              de origen ya coincide con el formato pedido; solo en caso
+              contrario se transcodifica con bitrate/VBR configurable.
+2. loudnorm:  normalización de sonoridad en dos pasadas (opcional).
+3. tag:       metadatos ID3/MP4 y portada (opcional, sin re-codificar audio).
+
+Principales funciones:
+- audio_format_selector(format_ext): selector yt-dlp que prioriza el códec pedido.
+- can_stream_copy(acodec, format_ext): indica si el origen se puede copiar.
+- process_audio(...): ejecuta las etapas y devuelve la ruta final.
+"""
+
+import os
+import re
+import json
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from app.core.config import settings
+from app.core.executors import run_io
+from app.services import ffmpeg_runner
+from app.services.ffmpeg_runner import FFmpegError
+
+# Formatos de audio soportados y los códecs de origen que admiten copia directa
+AUDIO_FORMATS = ["mp3", "m4a", "wav", "opus"]
+
+_COPY_CODECS = {
+    "mp3": ("mp3",),
+    "m4a": ("mp4a", "aac"),
+    "opus": ("opus",),
+    "wav": (),  # WAV siempre es PCM: nunca se copia desde un códec comprimido
+}
+
+# Selectores yt-dlp que priorizan un stream de audio ya en el códec pedido
+_PREFERRED_SELECTORS = {
+    "mp3": ["bestaudio[acodec=mp3]"],
+    "m4a": ["bestaudio[ext=m4a]", "bestaudio[acodec^=mp4a]"],
+    "opus": ["bestaudio[acodec=opus]"],
+    "wav": [],
+}
+
+# Formatos que admiten portada incrustada
+_COVER_FORMATS = ("mp3", "m4a")
+
+
+def audio_format_selector(format_ext: str) -> str:
+    """Devuelve el selector yt-dlp: primero el códec pedido, luego el mejor audio."""
+    preferred = _PREFERRED_SELECTORS.get(format_ext, [])
+    return "/".join(preferred + ["bestaudio", "best"])
+
+
+def can_stream_copy(acodec: Optional[str], format_ext: str) -> bool:
+    """True si el códec de origen puede copiarse tal cual al formato destino."""
+    if not acodec or acodec == "none":
+        return False
+    acodec = acodec.lower()
+    return any(acodec.startswith(c) for c in _COPY_CODECS.get(format_ext, ()))
+
+
+def _encode_args(format_ext: str) -> List[str]:
+    """Argumentos de códec para transcodificar al formato destino."""
+    bitrate = f"{settings.AUDIO_BITRATE_KBPS}k"
+    if format_ext == "mp3":
+        if settings.AUDIO_VBR:
+            return ["-c:a", "libmp3lame", "-q:a", str(settings.AUDIO_VBR_QUALITY)]
+        return ["-c:a", "libmp3lame", "-b:a", bitrate]
+    if format_ext == "opus":
+        return ["-c:a", "libopus", "-b:a", bitrate, "-vbr", "on" if settings.AUDIO_VBR else "off"]
+    if format_ext == "m4a":
+        # El encoder AAC nativo de FFmpeg solo es fiable en modo CBR
+        return ["-c:a", "aac", "-b:a", bitrate]
+    return ["-c:a", "pcm_s16le"]
+
+
+async def _ffmpeg_or_raise(ffmpeg_path: str, args: List[str], stage: str) -> str:
+    try:
+        return await ffmpeg_runner.run_ffmpeg(args, ffmpeg_path=ffmpeg_path)
+    except FFmpegError as e:
+        raise type(e)(f"FFmpeg falló en la etapa '{stage}': {e}", e.returncode, e.stderr) from e
+
+
+def _stage_path(dst: str, stage: str) -> str:
+    base, ext = os.path.splitext(dst)
+    return f"{base}.{stage}{ext}"
+
+
+# Etapa 1: extracción (copia directa o transcodificación)
+
+async def extract_audio(ffmpeg_path: str, src: str, dst: str, format_ext: str,
+                        acodec: Optional[str]) -> bool:
+    """
+    Lleva el audio de `src` al formato pedido en `dst`.
+    Devuelve True si fue necesario transcodificar.
+    """
+    src_ext = os.path.splitext(src)[1].lstrip(".").lower()
+    if can_stream_copy(acodec, format_ext):
+        if src_ext == format_ext:
+            # Mismo códec y contenedor: ni siquiera hace falta FFmpeg
+            await run_io(os.replace, src, dst)
+            return False
+        # Mismo códec, distinto contenedor: remux sin re-codificar
+        await _ffmpeg_or_raise(ffmpeg_path, ["-y", "-i", src, "-vn", "-c:a", "copy", dst], "extract")
+        return False
+
+    # FFmpeg no puede escribir sobre su propia entrada
+    out = dst if os.path.abspath(src) != os.path.abspath(dst) else _stage_path(dst, "extract")
+    await _ffmpeg_or_raise(ffmpeg_path, ["-y", "-i", src, "-vn", *_encode_args(format_ext), out], "extract")
+    if out != dst:
+        await run_io(os.replace, out, dst)
+    return True
+
+
+# Etapa 2: normalización de sonoridad en dos pasadas
+
+def _parse_loudnorm_json(stderr: str) -> Dict[str, str]:
+    """Extrae el bloque JSON que imprime el filtro loudnorm al final de stderr."""
+    matches = re.findall(r"\{[^{}]*\}", stderr)
+    if not matches:
+        raise RuntimeError("loudnorm no devolvió mediciones.")
+    return json.loads(matches[-1])
+
+
+async def normalize_loudness(ffmpeg_path: str, path: str, format_ext: str) -> None:
+    """Aplica loudnorm (EBU R128) en dos pasadas sobre `path`, in situ."""
+    target = f"I={settings.LOUDNORM_I}:TP={settings.LOUDNORM_TP}:LRA={settings.LOUDNORM_LRA}"
+
+    # Pasada 1: solo medición, sin escribir salida
+    stderr = await _ffmpeg_or_raise(
+        ffmpeg_path,
+        ["-i", path, "-vn", "-af", f"loudnorm={target}:print_format=json", "-f", "null", "-"],
+        "loudnorm-measure"
+    )
+    m = _parse_loudnorm_json(stderr)
+
+    # Pasada 2: corrección lineal usando las mediciones
+    af = (f"loudnorm={target}"
+          f":measured_I={m['input_i']}:measured_TP={m['input_tp']}"
+          f":measured_LRA={m['input_lra']}:measured_thresh={m['input_thresh']}"
+          f":offset={m['target_offset']}:linear=true")
+    out = _stage_path(path, "loudnorm")
+    await _ffmpeg_or_raise(
+        ffmpeg_path,
+        ["-y", "-i", path, "-vn", "-af", af, "-ar", "48000", *_encode_args(format_ext), out],
+        "loudnorm"
+    )
+    await run_io(os.replace, out, path)
+
+
+# Etapa 3: metadatos y portada
+
+def _metadata_args(info: dict) -> List[str]:
+    fields = {
+        "title": info.get("title"),
+        "artist": info.get("uploader") or info.get("channel"),
+        "date": (info.get("upload_date") or "")[:4] or None,
+        "comment": info.get("webpage_url"),
+    }
+    args: List[str] = []
+    for key, value in fields.items():
+        if value:
+            args += ["-metadata", f"{key}={value}"]
+    return args
+
+
+async def tag_audio(ffmpeg_path: str, path: str, format_ext: str, info: dict,
+                    cover_path: Optional[str] = None) -> None:
+    """Escribe metadatos (y portada si aplica) copiando el audio sin re-codificar."""
+    args = ["-y", "-i", path]
+    use_cover = bool(cover_path) and format_ext in _COVER_FORMATS and os.path.exists(cover_path)
+    if use_cover:
+        args += ["-i", cover_path, "-map", "0:a", "-map", "1:v",
+                 "-c:v", "mjpeg", "-disposition:v", "attached_pic"]
+    else:
+        args += ["-map", "0:a"]
+    args += ["-c:a", "copy", *_metadata_args(info)]
+    if format_ext == "mp3":
+        args += ["-id3v2_version", "3"]
+
+    out = _stage_path(path, "tag")
+    await _ffmpeg_or_raise(ffmpeg_path, args + [out], "tag")
+    await run_io(os.replace, out, path)
+
+
+# Orquestador
+
+async def process_audio(ffmpeg_path: str, src: str, dst: str, format_ext: str, info: dict,
+                        normalize: bool = False, embed_metadata: bool = False,
+                        cover_path: Optional[str] = None,
+                        completed: Iterable[str] = (),
+                        on_stage: Optional[Callable[[str], Awaitable[None]]] = None) -> Dict:
+    """
+    Ejecuta las etapas del pipeline de audio y devuelve un resumen:
+    { "path": dst, "transcoded": bool, "stages": [...] }
+
+    Las etapas incluidas en `completed` se omiten (reanudación) y
+    `on_stage(nombre)` se invoca al terminar cada una.
+    """
+    completed = set(completed)
+    stages = []
+    transcoded = False
+
+    async def _done(stage: str) -> None:
+        stages.append(stage)
+        if on_stage:
+            await on_stage(stage)
+
+    if "extract" not in completed:
+        transcoded = await extract_audio(ffmpeg_path, src, dst, format_ext, info.get("acodec"))
+        await _done("extract")
+
+    if normalize and "loudnorm" not in completed:
+        await normalize_loudness(ffmpeg_path, dst, format_ext)
+        transcoded = True
+        await _done("loudnorm")
+
+    if embed_metadata and "tag" not in completed:
+        await tag_audio(ffmpeg_path, dst, format_ext, info, cover_path)
+        await _done("tag")
+
+    return {"path": dst, "transcoded": transcoded, "stages": stages}
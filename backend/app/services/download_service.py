@@ -8,23 +8,59 @@ Principales funciones:
 - download_and_convert(url, format, quality): descarga el contenido
   respetando formato y calidad solicitados, combinando video+audio
   cuando es necesario y utilizando FFmpeg para conversiones finales.
+  El audio pasa por app/services/audio_service.py (copia directa
+  cuando el códec coincide, transcodificación solo si hace falta).
+- run_job(job): ejecuta (o reanuda) un trabajo por etapas:
+  download → [extract → loudnorm → tag] | [mux] → finalize.
+  Todo FFmpeg se ejecuta con app/services/ffmpeg_runner.py, así que
+  cancelar el trabajo (p. ej. si el cliente se desconecta) lo detiene.
+  Cada trabajo espera su turno en app/services/scheduler.py según su
+  clase de prioridad y la cuota de su cliente.
+  Nada bloqueante corre en el event loop: yt-dlp y el disco usan los
+  pools de app/core/executors.py.
+  Los formatos HTTP directos se bajan con varias conexiones en paralelo
+  (app/services/range_downloader.py); si el servidor no admite Range se
+  usa el descargador de yt-dlp.
+  El archivo final se guarda en el almacén por contenido de
+  app/services/media_store.py: "{title}.{ext}" es un enlace al blob.
+  Cada etapa completada queda registrada en app/services/job_service.py.
+- resume_pending_jobs(): bucle de fondo que reanuda los trabajos
+  abandonados por un reinicio o caída del proceso.
 
 """
 import os
+import copy
 import asyncio
 import datetime
+import threading
+import http.client
 import yt_dlp
-import shutil
 import re
-from typing import Dict
+from typing import Dict, Optional
 from fastapi import HTTPException
-from app.database.connection import db  
+from app.core.config import settings
+from app.core.executors import run_extract, run_download, run_io
+from app.database import connection
 from app.models.video_model import VideoModel
+from app.services import audio_service, job_service, ffmpeg_runner, media_store, info_service
+from app.services.ffmpeg_runner import FFmpegError, FFmpegTimeout
+from app.services.range_downloader import RangeDownloader, RangeNotSupported
+from app.services.scheduler import scheduler, estimate_cost, classify
 
 # Directorio de descargas
 DOWNLOAD_DIR = os.path.join(os.getcwd(), "downloads")
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
+# Metadatos de yt-dlp que se guardan en el checkpoint para las etapas posteriores
+_INFO_KEYS = ("title", "acodec", "extractor_key", "uploader", "channel",
+              "upload_date", "webpage_url", "duration")
+
+# Mensaje de cancelación cuando el cliente se desconecta: el trabajo no se reanuda
+CLIENT_GONE = "client-disconnected"
+
+# Referencias a las tareas de reanudación (evita que el GC las recoja)
+_background_tasks = set()
+
 def _safe_title(title: str) -> str:
     # Limpieza básica del título
     title = re.sub(r'[\\/:"*?<>|]+', "_", title)
@@ -35,133 +71,459 @@ def _parse_height(quality: str) -> int:
     m = re.search(r'(\d{3,4})', quality)
     return int(m.group(1)) if m else 0
 
-async def download_and_convert(url: str, format_ext: str = "mp4", quality: str = "720p") -> Dict:
-    url = str(url)
-    format_ext = (format_ext or "mp4").lower()
-    
-    # Verificar FFmpeg
-    ffmpeg_path = shutil.which("ffmpeg")
+def _find_ffmpeg() -> str:
+    ffmpeg_path = ffmpeg_runner.find_ffmpeg()
     if not ffmpeg_path:
-        local_ffmpeg = os.path.join(os.getcwd(), "ffmpeg.exe")
-        if os.path.exists(local_ffmpeg):
-            ffmpeg_path = local_ffmpeg
-        else:
-            raise HTTPException(status_code=500, detail="FFmpeg no encontrado.")
+        raise HTTPException(status_code=500, detail="FFmpeg no encontrado.")
+    return ffmpeg_path
+
+def _downloaded_path(info_dict: dict) -> str:
+    # Ruta del archivo descargado por yt-dlp (antes de cualquier etapa propia)
+    downloads = info_dict.get("requested_downloads") or []
+    if downloads and downloads[0].get("filepath"):
+        return downloads[0]["filepath"]
+    return info_dict.get("filepath") or info_dict.get("_filename") or ""
+
+def _video_encode_args(format_ext: str) -> list:
+    # Solo si la copia directa no es posible (códecs incompatibles con el contenedor)
+    if format_ext == "webm":
+        return ["-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", "-c:a", "libopus"]
+    return ["-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac"]
+
+def _thumbnail_path(info_dict: dict):
+    for thumb in info_dict.get("thumbnails") or []:
+        if thumb.get("filepath") and os.path.exists(thumb["filepath"]):
+            return thumb["filepath"]
+    return None
+
+def _cleanup_temp(filename_base: str) -> None:
+    # Limpieza de basura (archivos originales descargados antes del merge)
+    for f in os.listdir(DOWNLOAD_DIR):
+        if f.startswith(filename_base):
+            try:
+                os.remove(os.path.join(DOWNLOAD_DIR, f))
+            except:
+                pass
+
+def _find_output(filename_base: str, format_ext: str) -> str:
+    # El archivo final tendrá el nombre base + la extensión solicitada
+    expected = os.path.join(DOWNLOAD_DIR, f"{filename_base}.{format_ext}")
+    if os.path.exists(expected):
+        return expected
+    # Búsqueda de seguridad por si FFmpeg cambió algo levemente
+    for f in os.listdir(DOWNLOAD_DIR):
+        if f.startswith(filename_base) and f.endswith(f".{format_ext}"):
+            return os.path.join(DOWNLOAD_DIR, f)
+    return ""
+
+def _server_cost(url: str, audio_only: bool, height: int) -> float:
+    # Sin datos recientes de /info el trabajo se trata como grande (bulk)
+    probe = info_service.cached_probe(url)
+    if not probe:
+        return estimate_cost(None, None, audio_only)
+
+    def _largest(formats) -> int:
+        return max((f["size_bytes"] or 0 for f in formats), default=0)
+
+    size = _largest(f for f in probe["formats"] if f["audio_only"])
+    if not audio_only:
+        video = _largest(f for f in probe["formats"] if not f["audio_only"]
+                         and (not height or (f["height"] or 0) <= height))
+        # Sin tamaño de video conocido, mejor estimar por duración
+        size = size + video if video else 0
+    return estimate_cost(probe["duration"], size, audio_only)
 
-    # Generar ID
-    timestamp = int(datetime.datetime.utcnow().timestamp())
-    filename_base = f"temp_{timestamp}" 
-    outtmpl = os.path.join(DOWNLOAD_DIR, f"{filename_base}.%(ext)s")
+def _use_range_download(fmt: dict) -> bool:
+    # Solo descargas HTTP directas (no HLS/DASH por manifiesto, que yt-dlp trocea)
+    return (settings.RANGE_DOWNLOAD_ENABLED and bool(fmt.get("url"))
+            and fmt.get("protocol") in ("http", "https"))
 
-    audio_only = format_ext in ["mp3", "m4a", "wav", "opus"]
-    height = _parse_height(quality)
+def _ytdlp_partial(path: str) -> bool:
+    # .part sin .part.ranges: lo dejó yt-dlp (fallback anterior) y solo él puede continuarlo
+    return os.path.exists(f"{path}.part") and not os.path.exists(f"{path}.part.ranges")
+
+def _discard_partial(path: str) -> None:
+    # El .part de RangeDownloader está preasignado con huecos: yt-dlp no puede continuarlo
+    for leftover in (f"{path}.part", f"{path}.part.ranges"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+def _all_exist(paths: list) -> bool:
+    return bool(paths) and all(os.path.exists(p) for p in paths)
+
+def _build_ydl_opts(job: Dict, ffmpeg_path: str) -> Dict:
+    format_ext = job["format"]
+    outtmpl = os.path.join(DOWNLOAD_DIR, f"{job['filename_base']}.%(ext)s")
+    height = _parse_height(job["quality"])
 
     # Opciones Base
+    # Sin "overwrites": los .part existentes se continúan en vez de empezar de cero
     ydl_opts = {
         "outtmpl": outtmpl,
         "ffmpeg_location": ffmpeg_path,
         "quiet": True,
         "no_warnings": True,
         "noplaylist": True,
-        "overwrites": True,
+        "continuedl": True,
     }
 
-    if audio_only:
-        # SOLUCIÓN AUDIO ESTRICTA (MP3/M4A)
-        # Formato: Solo el mejor audio.
+    if format_ext in audio_service.AUDIO_FORMATS:
+        # === ESTRATEGIA AUDIO ===
+        # Se prioriza un stream ya en el códec pedido para poder copiarlo sin
+        # re-codificar. Sin postprocesadores: las etapas las hace audio_service.
         ydl_opts.update({
-            "format": "bestaudio/best",
-            # Postprocesador para extraer y CONVERTIR al formato deseado (ej: mp3)
-            "postprocessors": [{
-                "key": "FFmpegExtractAudio",
-                "preferredcodec": format_ext, # mp3, m4a, wav
-                "preferredquality": "192",
-                # OJO: Quitamos postprocessor_args, porque yt-dlp debe manejarlo con 'FFmpegExtractAudio'
-            }],
-            # Clave 1: Forzar que el archivo de salida final tenga la extensión correcta
-            "post_process_ext": format_ext 
+            "format": audio_service.audio_format_selector(format_ext),
+            "writethumbnail": job.get("embed_metadata", False),
         })
     else:
         # === ESTRATEGIA VIDEO (La que ya funciona rápido) ===
         if height > 0:
-            ydl_format = (f"bestvideo[height<={height}][ext=mp4]+bestaudio[ext=m4a]/" 
-                          f"bestvideo[height<={height}]+bestaudio/best[height<={height}]/best") 
+            ydl_format = (f"bestvideo[height<={height}][ext=mp4]+bestaudio[ext=m4a]/"
+                          f"bestvideo[height<={height}]+bestaudio/best[height<={height}]/best")
         else:
             ydl_format = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo+bestaudio/best"
 
-        ydl_opts.update({
-            "format": ydl_format,
-            "merge_output_format": format_ext, 
-            "postprocessors": [{
-                "key": "FFmpegVideoConvertor",
-                "preferedformat": format_ext,
-            }],
-            "postprocessor_args": [
-                "-preset", "ultrafast" 
-            ]
-        })
+        # Sin merge ni postprocesadores de yt-dlp: cada formato se descarga por
+        # separado y la etapa "mux" los une/convierte con ffmpeg_runner
+        ydl_opts["format"] = ydl_format
+
+    # Al reanudar, fijar los mismos formatos para que los .part sigan siendo válidos
+    if job.get("resolved_format"):
+        ydl_opts["format"] = f"{job['resolved_format']}/{ydl_opts['format']}"
+
+    return ydl_opts
+
+
+async def download_and_convert(url: str, format_ext: str = "mp4", quality: str = "720p",
+                               normalize: bool = False, embed_metadata: bool = False,
+                               client_id: str = "anonymous", priority: Optional[str] = None,
+                               duration: Optional[float] = None,
+                               size_bytes: Optional[int] = None) -> Dict:
+    url = str(url)
+    format_ext = (format_ext or "mp4").lower()
+
+    # Verificar FFmpeg antes de registrar el trabajo
+    _find_ffmpeg()
+
+    # Coste calculado en el servidor con lo que extrajo /info; las pistas del
+    # cliente (duration, size_bytes) solo pueden subirlo, nunca bajarlo
+    audio_only = format_ext in audio_service.AUDIO_FORMATS
+    cost = _server_cost(url, audio_only, _parse_height(quality))
+    if duration or size_bytes:
+        cost = max(cost, estimate_cost(duration, size_bytes, audio_only))
+    job = await job_service.create_job(url, format_ext, quality,
+                                       normalize=normalize, embed_metadata=embed_metadata,
+                                       client_id=client_id, priority=classify(priority, cost),
+                                       cost=cost)
+    return await run_job(job)
+
+
+async def run_job(job: Dict) -> Dict:
+    """
+    Ejecuta un trabajo (nuevo o reanudado) manteniendo su heartbeat,
+    también mientras espera turno en el planificador.
+    Si falla, queda marcado como "failed" y se limpian sus temporales;
+    si el proceso muere, queda "running" y otro worker lo reanudará.
+    """
+    job_id = job["_id"]
+    hb = asyncio.create_task(job_service.heartbeat(job_id))
+    try:
+        async with scheduler.slot(job.get("client_id", "anonymous"),
+                                  job.get("priority", "bulk"), job.get("cost", 0.0)):
+            result = await _run_stages(job)
+    except asyncio.CancelledError as e:
+        # Cancelado por el cliente: no reanudar. Cualquier otra cancelación
+        # (apagado del servidor) deja el trabajo "running" para reanudarlo.
+        if e.args and e.args[0] == CLIENT_GONE:
+            await job_service.update_job(job_id, status="cancelled", error=CLIENT_GONE)
+            await run_io(_cleanup_temp, job["filename_base"])
+        raise
+    except HTTPException as e:
+        await job_service.update_job(job_id, status="failed", error=str(e.detail))
+        await run_io(_cleanup_temp, job["filename_base"])
+        raise
+    except Exception as e:
+        await job_service.update_job(job_id, status="failed", error=str(e))
+        await run_io(_cleanup_temp, job["filename_base"])
+        raise
+    finally:
+        hb.cancel()
+
+    await job_service.update_job(job_id, status="done", result=result)
+    return result
+
+
+def _cancel_hook(cancelled: threading.Event):
+    # yt-dlp corre en un thread que no se puede matar: aborta en el siguiente progreso
+    def _hook(d: dict) -> None:
+        if cancelled.is_set():
+            raise yt_dlp.utils.DownloadCancelled("Trabajo cancelado")
+    return _hook
+
+
+async def _download(job: Dict, ffmpeg_path: str):
+    """
+    Etapa download: resuelve formatos, los guarda y descarga cada uno por
+    separado (continuando .part). Devuelve (info, rutas descargadas).
+    """
+    job_id = job["_id"]
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+    checkpointer = job_service.ProgressCheckpointer(job_id, loop, job.get("parts"))
+    ydl_opts = _build_ydl_opts(job, ffmpeg_path)
+    ydl_opts["progress_hooks"] = [_cancel_hook(cancelled), checkpointer]
 
-    def _run_yt_dlp():
+    def _resolve():
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            return info
+            return ydl.extract_info(job["url"], download=False)
+
+    def _fetch(format_id: str, outtmpl: str, **extra):
+        opts = dict(ydl_opts, format=format_id, outtmpl=outtmpl, **extra)
+        # Sin la selección previa: si no, yt-dlp la reutiliza y fusiona todos los formatos
+        data = copy.deepcopy(info)
+        data.pop("requested_formats", None)
+        data.pop("requested_downloads", None)
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            return ydl.process_ie_result(data, download=True)
+
+    def _range_fetch(fmt: dict, dest: str) -> str:
+        RangeDownloader(fmt["url"], dest, headers=fmt.get("http_headers"), cookies=fmt.get("cookies"),
+                        on_progress=checkpointer, cancelled=cancelled).download()
+        return dest
 
     try:
-        info_dict = await asyncio.to_thread(_run_yt_dlp)
+        info = await run_extract(_resolve)
+
+        # Checkpoint de los formatos elegidos antes de escribir un solo byte
+        resolved = info.get("format_id")
+        if resolved and resolved != job.get("resolved_format"):
+            job["resolved_format"] = resolved
+            await job_service.update_job(job_id, resolved_format=resolved)
+
+        requested = info.get("requested_formats") or [info]
+        sources = []
+        downloaded = None
+        for fmt in requested:
+            outtmpl = ydl_opts["outtmpl"]
+            if len(requested) > 1:
+                outtmpl = os.path.join(DOWNLOAD_DIR, f"{job['filename_base']}.f{fmt['format_id']}.%(ext)s")
+            dest = outtmpl.replace("%(ext)s", fmt.get("ext") or "bin")
+            # Formato ya completo de un intento anterior: no se vuelve a descargar
+            if await run_io(os.path.exists, dest):
+                sources.append(dest)
+                continue
+            if _use_range_download(fmt) and not await run_io(_ytdlp_partial, dest):
+                try:
+                    path = await run_download(_range_fetch, fmt, dest)
+                    # Igual que el fixup de yt-dlp: un m4a DASH suelto se remuxea
+                    if len(requested) == 1 and str(fmt.get("container", "")).endswith("_dash"):
+                        fixed = os.path.join(DOWNLOAD_DIR, f"{job['filename_base']}.fixup.{fmt['ext']}")
+                        await ffmpeg_runner.run_ffmpeg(["-y", "-i", path, "-c", "copy", fixed],
+                                                       ffmpeg_path=ffmpeg_path)
+                        await run_io(os.replace, fixed, path)
+                    sources.append(path)
+                    continue
+                except RangeNotSupported as e:
+                    print(f"ℹ️ Sin descarga por rangos ({e}); se usa yt-dlp")
+                except (OSError, http.client.HTTPException) as e:
+                    print(f"⚠️ Descarga por rangos fallida ({e}); se usa yt-dlp")
+                if cancelled.is_set():
+                    raise yt_dlp.utils.DownloadCancelled("Trabajo cancelado")
+                await run_io(_discard_partial, dest)
+            downloaded = await run_download(_fetch, fmt["format_id"], outtmpl)
+            sources.append(_downloaded_path(downloaded))
+
+        # Miniatura (si se pidió): si todo vino por rangos, pedirla aparte a yt-dlp
+        if downloaded is None and ydl_opts.get("writethumbnail"):
+            downloaded = await run_download(_fetch, info.get("format_id"), ydl_opts["outtmpl"],
+                                            skip_download=True)
+        info["thumbnails"] = (downloaded or {}).get("thumbnails") or info.get("thumbnails")
+        return info, sources
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
     except Exception as e:
         print(f"ERROR: {e}")
         raise HTTPException(status_code=500, detail=f"Error descarga: {str(e)}")
 
-    # === BÚSQUEDA DEL ARCHIVO FINAL ===
-    # El archivo final tendrá el nombre base + la extensión solicitada
-    expected_file = f"{filename_base}.{format_ext}"
-    final_path_temp = os.path.join(DOWNLOAD_DIR, expected_file)
 
-    # Búsqueda de seguridad por si FFmpeg cambió algo levemente
-    if not os.path.exists(final_path_temp):
-        found = False
-        for f in os.listdir(DOWNLOAD_DIR):
-            if f.startswith(filename_base) and f.endswith(f".{format_ext}"):
-                final_path_temp = os.path.join(DOWNLOAD_DIR, f)
-                found = True
-                break
-        if not found:
-            raise HTTPException(status_code=500, detail="Error: El archivo no se generó correctamente.")
+async def _mux_video(ffmpeg_path: str, sources: list, dst: str, format_ext: str) -> None:
+    """
+    Etapa mux: une video+audio y/o cambia de contenedor con copia directa;
+    solo transcodifica si los códecs no caben en el contenedor pedido.
+    """
+    if len(sources) == 1 and sources[0].endswith(f".{format_ext}"):
+        await run_io(os.replace, sources[0], dst)
+        return
 
-    # Renombrar y Mover
-    title = _safe_title(info_dict.get("title", "video"))
-    clean_filename = f"{title}.{format_ext}"
-    clean_path = os.path.join(DOWNLOAD_DIR, clean_filename)
+    inputs = []
+    for src in sources:
+        inputs += ["-i", src]
+    if len(sources) > 1:
+        maps = ["-map", "0:v:0", "-map", "1:a:0"]
+    else:
+        # Solo video y audio: datos/subtítulos suelen no caber en mp4/webm
+        maps = ["-map", "0:v?", "-map", "0:a?"]
 
-    if os.path.exists(clean_path):
-        os.remove(clean_path)
-    shutil.move(final_path_temp, clean_path)
+    try:
+        await ffmpeg_runner.run_ffmpeg(["-y", *inputs, *maps, "-c", "copy", dst], ffmpeg_path=ffmpeg_path)
+    except FFmpegTimeout:
+        raise
+    except FFmpegError:
+        await ffmpeg_runner.run_ffmpeg(
+            ["-y", *inputs, *maps, *_video_encode_args(format_ext), dst], ffmpeg_path=ffmpeg_path
+        )
 
-    # Limpieza de basura (archivos originales descargados antes del merge)
-    for f in os.listdir(DOWNLOAD_DIR):
-        if f.startswith(filename_base):
-            try:
-                os.remove(os.path.join(DOWNLOAD_DIR, f))
-            except:
-                pass
 
-    # DB
+async def _run_stages(job: Dict) -> Dict:
+    ffmpeg_path = _find_ffmpeg()
+    job_id = job["_id"]
+    format_ext = job["format"]
+    filename_base = job["filename_base"]
+    stages = set(job.get("stages") or [])
+    audio_only = format_ext in audio_service.AUDIO_FORMATS
+
+    await job_service.update_job(job_id, status="running")
+
+    # === ETAPA DOWNLOAD ===
+    if "download" in stages:
+        info = job.get("info") or {}
+        sources = job.get("sources") or []
+    else:
+        info_dict, sources = await _download(job, ffmpeg_path)
+        info = {k: info_dict.get(k) for k in _INFO_KEYS}
+        info["thumbnail_path"] = await run_io(_thumbnail_path, info_dict)
+        await job_service.update_job(job_id, info=info, sources=sources)
+        await job_service.complete_stage(job_id, "download")
+
+    output_temp = os.path.join(DOWNLOAD_DIR, f"{filename_base}.{format_ext}")
+
+    # === ETAPAS DE AUDIO (extract → loudnorm → tag) ===
+    if audio_only:
+        source = sources[0] if sources else ""
+        if "extract" not in stages and not await run_io(_all_exist, [source] if source else []):
+            # La copia directa es un rename: si el proceso murió justo después,
+            # el origen ya no existe pero la salida sí → extract ya está hecho
+            if not await run_io(os.path.exists, output_temp):
+                raise HTTPException(status_code=500, detail="Error: El audio no se descargó correctamente.")
+            stages.add("extract")
+            await job_service.complete_stage(job_id, "extract")
+        try:
+            await audio_service.process_audio(
+                ffmpeg_path, source, output_temp,
+                format_ext, info,
+                normalize=job.get("normalize", False),
+                embed_metadata=job.get("embed_metadata", False),
+                cover_path=info.get("thumbnail_path"),
+                completed=stages,
+                on_stage=lambda stage: job_service.complete_stage(job_id, stage),
+            )
+        except Exception as e:
+            print(f"ERROR: {e}")
+            raise HTTPException(status_code=500, detail=f"Error conversión de audio: {str(e)}")
+
+    # === ETAPA DE VIDEO (mux) ===
+    elif "mux" not in stages:
+        if not await run_io(_all_exist, sources):
+            raise HTTPException(status_code=500, detail="Error: El video no se descargó correctamente.")
+        try:
+            await _mux_video(ffmpeg_path, sources, output_temp, format_ext)
+        except FFmpegError as e:
+            print(f"ERROR: {e}")
+            raise HTTPException(status_code=500, detail=f"Error conversión de video: {str(e)}")
+        await job_service.complete_stage(job_id, "mux")
+
+    # === ETAPA FINALIZE ===
+    title = _safe_title(info.get("title") or "video")
+
+    # === ALMACÉN POR CONTENIDO (hash → blob, título → enlace) ===
+    # El hash se guarda en el trabajo antes de mover el archivo: si el proceso
+    # muere a mitad, la reanudación encuentra el blob aunque el temporal ya no exista
+    if "store" not in stages:
+        final_path_temp = await run_io(_find_output, filename_base, format_ext)
+        if not job.get("content_hash"):
+            if not final_path_temp:
+                raise HTTPException(status_code=500, detail="Error: El archivo no se generó correctamente.")
+            job["content_hash"] = await run_io(media_store.hash_file, final_path_temp)
+            await job_service.update_job(job_id, content_hash=job["content_hash"])
+
+        target = media_store.blob_path(job["content_hash"], f".{format_ext}")
+        if final_path_temp:
+            await run_io(media_store.store_blob, final_path_temp, job["content_hash"], f".{format_ext}")
+        elif not await run_io(os.path.exists, target):
+            raise HTTPException(status_code=500, detail="Error: El archivo no se generó correctamente.")
+        job["filename"] = await run_io(media_store.publish, target, f"{title}.{format_ext}",
+                                       final_path_temp or None)
+        await job_service.update_job(job_id, filename=job["filename"])
+        await job_service.complete_stage(job_id, "store")
+
+    clean_filename = job["filename"]
+    result = {
+        "filename": clean_filename,
+        "download_url": f"/api/video/downloads/{clean_filename}",
+        "status": "success",
+        "job_id": job_id,
+    }
+    if "finalize" in stages:
+        return result
+
+    await run_io(_cleanup_temp, filename_base)
+
+    # DB: cada documento de "videos" es una referencia al blob. Upsert por
+    # job_id y referencia identificada por el trabajo: reanudar no duplica nada
     try:
         vm = VideoModel(
             title=title,
             filename=clean_filename,
             format=format_ext,
-            quality=quality,
-            platform=info_dict.get("extractor_key", "unknown"),
+            quality=job["quality"],
+            platform=info.get("extractor_key") or "unknown",
             download_url=f"/api/video/downloads/{clean_filename}",
+            content_hash=job["content_hash"],
+            size_bytes=await run_io(os.path.getsize, os.path.join(DOWNLOAD_DIR, clean_filename)),
+            job_id=job_id,
             created_at=datetime.datetime.utcnow(),
         )
-        await db["videos"].insert_one(vm.model_dump(by_alias=True))
-    except Exception:
-        pass
+        await connection.db["videos"].update_one(
+            {"job_id": job_id},
+            {"$setOnInsert": vm.model_dump(by_alias=True, exclude_none=True)},
+            upsert=True,
+        )
+        await media_store.add_reference({
+            "content_hash": job["content_hash"],
+            "blob": os.path.relpath(media_store.blob_path(job["content_hash"], f".{format_ext}"),
+                                    media_store.STORE_DIR),
+            "size_bytes": vm.size_bytes,
+        }, job_id)
+    except Exception as e:
+        print(f"⚠️ No se pudo registrar el video {clean_filename}: {e}")
 
-    return {
-        "filename": clean_filename,
-        "download_url": f"/api/video/downloads/{clean_filename}",
-        "status": "success"
-    }
\ No newline at end of file
+    await job_service.complete_stage(job_id, "finalize")
+    return result
+
+
+#  REANUDACIÓN DE TRABAJOS
+
+async def _resume(job: Dict) -> None:
+    try:
+        await run_job(job)
+        print(f"✅ Trabajo reanudado y completado: {job['_id']}")
+    except Exception as e:
+        print(f"❌ Falló la reanudación del trabajo {job['_id']}: {e}")
+
+
+async def resume_pending_jobs() -> None:
+    """
+    Bucle de fondo (se lanza en el startup): reclama periódicamente los
+    trabajos sin heartbeat y los reanuda desde su última etapa completada.
+    """
+    while True:
+        try:
+            for job in await job_service.claim_stale_jobs():
+                print(f"🔁 Reanudando trabajo {job['_id']} (etapas: {job.get('stages')})")
+                task = asyncio.create_task(_resume(job))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+        except Exception as e:
+            print(f"⚠️ Error buscando trabajos pendientes: {e}")
+        await asyncio.sleep(settings.JOB_RESUME_INTERVAL_SECONDS)
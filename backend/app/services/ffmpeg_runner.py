@@ -0,0 +1,186 @@
+"""
+app/services/ffmpeg_runner.py
+-------------------------------------------
+Ejecutor único de FFmpeg para todo el backend.
+
+- Lee stderr y el progreso (-progress pipe:1) de forma incremental:
+  solo se conservan las últimas líneas de stderr, nunca todo en memoria.
+- Aplica timeout de reloj (wall-clock) y de CPU (RLIMIT_CPU).
+- Baja la prioridad (nice) y limita memoria (RLIMIT_AS) en POSIX.
+- Ante cancelación (cliente desconectado, trabajo cancelado) o timeout
+  mata el grupo de procesos completo.
+
+Principales funciones:
+- run_ffmpeg(args, ...): ejecuta FFmpeg y devuelve el final de stderr.
+"""
+
+import os
+import signal
+import shutil
+import asyncio
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from app.core.config import settings
+
+_POSIX = os.name == "posix"
+if _POSIX:
+    import resource
+
+# Tiempo de gracia entre SIGTERM y SIGKILL
+_KILL_GRACE_SECONDS = 3
+
+
+class FFmpegError(RuntimeError):
+    """FFmpeg terminó con error. `stderr` contiene las últimas líneas."""
+
+    def __init__(self, message: str, returncode: Optional[int] = None, stderr: str = ""):
+        super().__init__(message)
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class FFmpegTimeout(FFmpegError):
+    """FFmpeg superó el límite de tiempo de reloj o de CPU."""
+
+
+def find_ffmpeg() -> Optional[str]:
+    """Busca FFmpeg en el PATH o como ffmpeg.exe en el directorio actual."""
+    ffmpeg_path = shutil.which("ffmpeg")
+    if not ffmpeg_path:
+        local_ffmpeg = os.path.join(os.getcwd(), "ffmpeg.exe")
+        if os.path.exists(local_ffmpeg):
+            ffmpeg_path = local_ffmpeg
+    return ffmpeg_path
+
+
+def _limit_resources(pid: int, cpu_seconds: Optional[int]) -> None:
+    """
+    Aplica nice y rlimits al proceso ya lanzado, desde el padre.
+    No se usa preexec_fn: con hilos en el proceso (pools, descargas por
+    rangos, monitor del loop) ejecutar Python entre fork y exec puede
+    bloquear al hijo. resource.prlimit solo existe en Linux; en otros
+    POSIX quedan el nice y el timeout de reloj.
+    """
+    try:
+        if settings.FFMPEG_NICE:
+            os.setpriority(os.PRIO_PROCESS, pid, settings.FFMPEG_NICE)
+        if hasattr(resource, "prlimit"):
+            if cpu_seconds:
+                # El kernel envía SIGXCPU al llegar al límite blando y SIGKILL al duro
+                resource.prlimit(pid, resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + _KILL_GRACE_SECONDS))
+            if settings.FFMPEG_MAX_MEMORY_MB:
+                limit = settings.FFMPEG_MAX_MEMORY_MB * 1024 * 1024
+                resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+    except ProcessLookupError:
+        pass  # FFmpeg ya terminó
+
+
+async def _kill_tree(process: asyncio.subprocess.Process) -> None:
+    """Termina FFmpeg y cualquier hijo: SIGTERM al grupo y luego SIGKILL."""
+    if process.returncode is not None:
+        return
+    try:
+        if _POSIX:
+            os.killpg(process.pid, signal.SIGTERM)
+        else:
+            process.terminate()
+        await asyncio.wait_for(process.wait(), _KILL_GRACE_SECONDS)
+    except (ProcessLookupError, asyncio.TimeoutError):
+        pass
+    if process.returncode is None:
+        try:
+            if _POSIX:
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+
+async def _read_stderr(stream: asyncio.StreamReader, tail: deque) -> None:
+    async for line in stream:
+        tail.append(line.decode(errors="replace").rstrip())
+
+
+async def _read_progress(stream: asyncio.StreamReader,
+                         on_progress: Optional[Callable[[Dict[str, str]], None]]) -> None:
+    # Bloques "clave=valor" terminados en "progress=continue|end"
+    block: Dict[str, str] = {}
+    async for raw in stream:
+        key, _, value = raw.decode(errors="replace").strip().partition("=")
+        if not key:
+            continue
+        block[key] = value
+        if key == "progress":
+            if on_progress:
+                on_progress(block)
+            block = {}
+
+
+async def run_ffmpeg(args: List[str], ffmpeg_path: Optional[str] = None,
+                     timeout: Optional[float] = None, cpu_seconds: Optional[int] = None,
+                     on_progress: Optional[Callable[[Dict[str, str]], None]] = None) -> str:
+    """
+    Ejecuta `ffmpeg <args>` y devuelve las últimas líneas de stderr.
+
+    Args:
+        args: argumentos de FFmpeg (entradas, filtros, salida).
+        ffmpeg_path: binario a usar (por defecto find_ffmpeg()).
+        timeout: límite de reloj en segundos (por defecto FFMPEG_TIMEOUT_SECONDS).
+        cpu_seconds: límite de CPU en segundos (por defecto FFMPEG_CPU_SECONDS).
+        on_progress: callback con cada bloque de -progress (out_time_us, speed, ...).
+
+    Raises:
+        FFmpegTimeout: se superó el límite de reloj o de CPU.
+        FFmpegError: FFmpeg terminó con código distinto de 0.
+        asyncio.CancelledError: la tarea se canceló (el proceso ya fue terminado).
+    """
+    ffmpeg_path = ffmpeg_path or find_ffmpeg()
+    if not ffmpeg_path:
+        raise FFmpegError("FFmpeg no encontrado.")
+    timeout = timeout if timeout is not None else settings.FFMPEG_TIMEOUT_SECONDS
+    cpu_seconds = cpu_seconds if cpu_seconds is not None else settings.FFMPEG_CPU_SECONDS
+
+    # El progreso va por stdout salvo que la salida de FFmpeg sea stdout
+    writes_stdout = "-" in args or "pipe:1" in args
+    cmd = [ffmpeg_path, "-hide_banner", "-nostdin", "-nostats"]
+    if not writes_stdout:
+        cmd += ["-progress", "pipe:1"]
+    cmd += args
+
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL if writes_stdout else asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=_POSIX,
+    )
+    if _POSIX:
+        _limit_resources(process.pid, cpu_seconds)
+
+    tail: deque = deque(maxlen=settings.FFMPEG_STDERR_TAIL_LINES)
+    readers = [_read_stderr(process.stderr, tail)]
+    if not writes_stdout:
+        readers.append(_read_progress(process.stdout, on_progress))
+
+    async def _communicate():
+        await asyncio.gather(*readers)
+        return await process.wait()
+
+    try:
+        returncode = await asyncio.wait_for(_communicate(), timeout or None)
+    except asyncio.TimeoutError:
+        await _kill_tree(process)
+        raise FFmpegTimeout(f"FFmpeg superó el límite de {timeout}s.", process.returncode, "\n".join(tail))
+    except BaseException:
+        # Cancelación o error inesperado: no dejar FFmpeg huérfano
+        await _kill_tree(process)
+        raise
+
+    stderr = "\n".join(tail)
+    if _POSIX and returncode in (-signal.SIGXCPU, -signal.SIGKILL) and cpu_seconds:
+        raise FFmpegTimeout(f"FFmpeg superó el límite de {cpu_seconds}s de CPU.", returncode, stderr)
+    if returncode != 0:
+        raise FFmpegError(f"FFmpeg terminó con código {returncode}: {stderr[-500:]}", returncode, stderr)
+    return stderr
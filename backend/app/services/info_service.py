@@ -6,6 +6,9 @@ usando yt-dlp. Devuelve una estructura normalizada para el frontend.
 
 Función principal:
 - get_video_info(url: str) -> dict
+- cached_probe(url: str) -> dict | None: duración y tamaños de formato que
+  extrajo /info hace poco; el planificador calcula con ellos el coste de
+  un trabajo en el servidor en vez de fiarse de lo que envía el cliente.
 
 Formato de retorno (ejemplo):
 {
@@ -22,10 +25,16 @@ Formato de retorno (ejemplo):
 }
 """
 
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional
-import asyncio
 import math
+import time
 import yt_dlp
+from app.core.config import settings
+from app.core.executors import run_extract
+
+# Caché LRU url → (expira, datos para estimar el coste)
+_probe_cache: "OrderedDict[str, tuple]" = OrderedDict()
 
 
 # Funciones Helper 
@@ -79,12 +88,41 @@ def _normalize_format(fmt: dict) -> dict:
     }
 
 
+def _remember_probe(url: str, info: dict) -> None:
+    _probe_cache[url] = (time.monotonic() + settings.SCHEDULER_INFO_CACHE_SECONDS, {
+        "duration": info.get("duration"),
+        "formats": [
+            {
+                "height": f.get("height"),
+                "audio_only": f.get("vcodec") == "none",
+                "size_bytes": f.get("filesize") or f.get("filesize_approx"),
+            }
+            for f in info.get("formats") or []
+        ],
+    })
+    _probe_cache.move_to_end(url)
+    while len(_probe_cache) > settings.SCHEDULER_INFO_CACHE_SIZE:
+        _probe_cache.popitem(last=False)
+
+
+def cached_probe(url: str) -> Optional[dict]:
+    """Datos de /info para `url` si siguen vigentes; None si no hay."""
+    entry = _probe_cache.get(str(url))
+    if not entry:
+        return None
+    expires, probe = entry
+    if expires < time.monotonic():
+        _probe_cache.pop(str(url), None)
+        return None
+    return probe
+
+
 # Función principal  
 
 async def get_video_info(url: str) -> Dict[str, Any]:
     """
     Extrae la info del video y retorna una estructura lista para el frontend.
-    Ejecuta yt-dlp en un thread con asyncio.to_thread.
+    Ejecuta yt-dlp en el pool "extract" (app/core/executors.py).
     """
     url = str(url)  # Importante: convertir HttpUrl -> str si es necesario
 
@@ -94,7 +132,8 @@ async def get_video_info(url: str) -> Dict[str, Any]:
             info = ydl.extract_info(url, download=False)
         return info
 
-    info = await asyncio.to_thread(_extract)
+    info = await run_extract(_extract)
+    _remember_probe(url, info)
 
     # Campos generales
     title = info.get("title", "")
@@ -0,0 +1,134 @@
+"""
+app/services/job_service.py
+-------------------------------------------
+Checkpoints de trabajos de descarga en MongoDB (colección "jobs").
+
+Cada trabajo guarda los formatos resueltos, los bytes ya escritos en
+los archivos .part y las etapas completadas. Si el proceso se reinicia,
+los trabajos sin heartbeat reciente se reclaman y se reanudan: yt-dlp
+continúa los .part existentes y las etapas terminadas se omiten.
+
+Principales funciones:
+- create_job(...): registra un trabajo nuevo.
+- update_job(job_id, **fields) / complete_stage(job_id, stage)
+- claim_stale_jobs(): reclama atómicamente los trabajos abandonados.
+- ProgressCheckpointer: progress hook de yt-dlp que persiste offsets.
+- heartbeat(job_id): mantiene vivo el lease mientras el trabajo corre.
+"""
+
+import asyncio
+import datetime
+import os
+import time
+from typing import Dict, List, Optional
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.database import connection
+from app.models.job_model import JobModel
+
+UNFINISHED = ["pending", "running"]
+
+
+def _jobs():
+    # Se resuelve en cada llamada: connection.db se asigna en el startup
+    return connection.db["jobs"]
+
+
+async def create_job(url: str, format: str, quality: str,
+                     normalize: bool = False, embed_metadata: bool = False,
+                     client_id: str = "anonymous", priority: str = "interactive",
+                     cost: float = 0.0) -> Dict:
+    """Crea y persiste un trabajo nuevo. Devuelve el documento."""
+    job = JobModel(url=url, format=format, quality=quality,
+                   normalize=normalize, embed_metadata=embed_metadata,
+                   client_id=client_id, priority=priority, cost=cost)
+    job.filename_base = f"temp_{job.id}"
+    doc = job.model_dump(by_alias=True)
+    try:
+        await _jobs().insert_one(doc)
+    except Exception as e:
+        # Sin checkpoint el trabajo sigue adelante, pero no será reanudable
+        print(f"⚠️ No se pudo registrar el trabajo {job.id}: {e}")
+    return doc
+
+
+async def update_job(job_id: str, **fields) -> None:
+    """Actualiza campos del trabajo y renueva su heartbeat."""
+    fields["heartbeat_at"] = datetime.datetime.utcnow()
+    try:
+        await _jobs().update_one({"_id": job_id}, {"$set": fields})
+    except Exception as e:
+        print(f"⚠️ No se pudo actualizar el trabajo {job_id}: {e}")
+
+
+async def complete_stage(job_id: str, stage: str) -> None:
+    """Marca una etapa como completada."""
+    try:
+        await _jobs().update_one(
+            {"_id": job_id},
+            {"$addToSet": {"stages": stage},
+             "$set": {"heartbeat_at": datetime.datetime.utcnow()}}
+        )
+    except Exception as e:
+        print(f"⚠️ No se pudo registrar la etapa '{stage}' del trabajo {job_id}: {e}")
+
+
+async def claim_stale_jobs() -> List[Dict]:
+    """
+    Reclama los trabajos sin terminar cuyo heartbeat expiró.
+    La actualización es atómica por documento, así que dos workers
+    nunca reanudan el mismo trabajo a la vez.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    stale = {"status": {"$in": UNFINISHED}, "heartbeat_at": {"$lt": cutoff}}
+    claimed = []
+    async for candidate in _jobs().find(stale, {"_id": 1}):
+        job = await _jobs().find_one_and_update(
+            {"_id": candidate["_id"], **stale},
+            {"$set": {"status": "running", "heartbeat_at": datetime.datetime.utcnow()},
+             "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not job:
+            continue  # otro worker lo reclamó primero
+        if job["attempts"] > settings.JOB_MAX_ATTEMPTS:
+            await update_job(job["_id"], status="failed", error="Demasiados reintentos")
+            continue
+        claimed.append(job)
+    return claimed
+
+
+async def heartbeat(job_id: str) -> None:
+    """Renueva el lease periódicamente. Cancelar la tarea al terminar el trabajo."""
+    interval = max(settings.JOB_LEASE_SECONDS / 3, 1)
+    while True:
+        await asyncio.sleep(interval)
+        await update_job(job_id)
+
+
+class ProgressCheckpointer:
+    """
+    Progress hook de yt-dlp que persiste los offsets de los .part.
+    Se ejecuta en el thread de descarga: las escrituras se programan
+    en el event loop y se limitan a una cada JOB_CHECKPOINT_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, job_id: str, loop: asyncio.AbstractEventLoop,
+                 parts: Optional[List[Dict]] = None):
+        self.job_id = job_id
+        self.loop = loop
+        self.parts = {p["file"]: p["bytes"] for p in (parts or [])}
+        self._last_flush = 0.0
+
+    def __call__(self, d: dict) -> None:
+        tmp = d.get("tmpfilename") or d.get("filename")
+        if not tmp:
+            return
+        self.parts[os.path.basename(tmp)] = d.get("downloaded_bytes") or 0
+
+        now = time.monotonic()
+        if d.get("status") != "finished" and now - self._last_flush < settings.JOB_CHECKPOINT_INTERVAL_SECONDS:
+            return
+        self._last_flush = now
+        parts = [{"file": f, "bytes": b} for f, b in self.parts.items()]
+        asyncio.run_coroutine_threadsafe(update_job(self.job_id, parts=parts), self.loop)
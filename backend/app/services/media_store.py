@@ -0,0 +1,199 @@
+"""
+app/services/media_store.py
+-------------------------------------------
+Almacén de archivos direccionado por contenido.
+
+Cada archivo terminado se guarda una sola vez en store/ (fuera de
+downloads/, que se sirve como estático) con su SHA-256 como nombre. El
+nombre legible ("{title}.{ext}") en downloads/ es un enlace duro al blob
+(o simbólico, o copia si el sistema de archivos no admite enlaces). Así,
+URLs distintas que apuntan al mismo contenido (enlaces cortos, mirrors)
+no duplican GBs en disco, y videos distintos con el mismo título ya no
+se pisan: el nombre recibe un sufijo " (2)".
+
+La colección "blobs" de MongoDB lleva las referencias: cada documento de
+"videos" es una referencia (identificada por ref_id, así que sumarla o
+restarla dos veces no cambia el conteo) y el blob se borra al llegar a 0.
+
+Principales funciones:
+- ingest(src, filename): (sync, correr en el pool io) hash + store_blob +
+  publish. Devuelve hash, tamaño y nombre final.
+- hash_file / store_blob / publish: los mismos pasos por separado, para
+  que un trabajo pueda guardar el hash antes de mover el archivo y
+  reanudar sin perderlo.
+- add_reference(stored, ref_id) / release(content_hash, ref_id).
+"""
+
+import os
+import shutil
+import hashlib
+from typing import Dict, Optional
+from pymongo import ReturnDocument
+from app.core.executors import run_io
+from app.database import connection
+
+DOWNLOAD_DIR = os.path.join(os.getcwd(), "downloads")
+# Fuera de downloads/: los blobs no deben poder pedirse por su hash
+STORE_DIR = os.path.join(os.getcwd(), "store")
+os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+os.makedirs(STORE_DIR, exist_ok=True)
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _blobs():
+    return connection.db["blobs"]
+
+
+def blob_path(content_hash: str, ext: str) -> str:
+    # Subdirectorio por prefijo para no tener miles de archivos en una carpeta
+    return os.path.join(STORE_DIR, content_hash[:2], f"{content_hash}{ext}")
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 del archivo leído en bloques (memoria constante)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _move_into(src: str, target: str) -> None:
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        # Mismo sistema de archivos: rename atómico
+        os.replace(src, target)
+    except OSError:
+        # Otro dispositivo: copiar a un temporal del almacén y renombrar
+        staging = os.path.join(STORE_DIR, f".incoming-{os.path.basename(src)}")
+        shutil.copyfile(src, staging)
+        os.replace(staging, target)
+        os.remove(src)
+
+
+def store_blob(src: str, content_hash: str, ext: str) -> str:
+    """
+    Mueve `src` al blob de `content_hash` si aún no existe. Si ya existe,
+    `src` se conserva hasta publicar el nombre (ver publish).
+    """
+    target = blob_path(content_hash, ext)
+    if not os.path.exists(target):
+        _move_into(src, target)
+    return target
+
+
+def _same_file(a: str, b: str) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def _link(target: str, name_path: str) -> None:
+    try:
+        os.link(target, name_path)
+    except (FileNotFoundError, FileExistsError):
+        # Blob borrado por un release concurrente (no dejar un enlace colgante)
+        # o nombre tomado por otro trabajo: lo resuelve publish
+        raise
+    except OSError:
+        try:
+            os.symlink(target, name_path)
+        except OSError:
+            shutil.copyfile(target, name_path)
+
+
+def publish(target: str, filename: str, src: Optional[str] = None) -> str:
+    """
+    Crea el nombre legible apuntando al blob; evita pisar otro contenido.
+    Si el blob se borró entre store_blob y el enlace (otro video soltó su
+    última referencia), se vuelve a guardar desde `src`.
+    """
+    base, ext = os.path.splitext(filename)
+    candidate = filename
+    n = 2
+    while True:
+        name_path = os.path.join(DOWNLOAD_DIR, candidate)
+        if not os.path.lexists(name_path):
+            try:
+                _link(target, name_path)
+                break
+            except FileExistsError:
+                pass  # otro trabajo tomó el nombre al mismo tiempo
+            except FileNotFoundError:
+                if not src or not os.path.exists(src):
+                    raise
+                _move_into(src, target)
+                continue
+        elif _same_file(name_path, target):
+            break  # mismo contenido ya publicado con este nombre
+        candidate = f"{base} ({n}){ext}"
+        n += 1
+
+    # El blob ya existía: la copia de `src` sobra
+    if src and os.path.exists(src) and not _same_file(src, target):
+        os.remove(src)
+    return candidate
+
+
+def ingest(src: str, filename: str) -> Dict:
+    """
+    Guarda `src` en el almacén y publica `filename` como enlace al blob.
+    Bloqueante: llamar con run_io.
+    """
+    ext = os.path.splitext(filename)[1]
+    content_hash = hash_file(src)
+    target = store_blob(src, content_hash, ext)
+    name = publish(target, filename, src)
+    return {
+        "content_hash": content_hash,
+        "size_bytes": os.path.getsize(target),
+        "blob": os.path.relpath(target, STORE_DIR),
+        "filename": name,
+    }
+
+
+async def add_reference(stored: Dict, ref_id: str) -> None:
+    """Suma la referencia `ref_id` al blob; repetirla no cambia el conteo."""
+    blobs = _blobs()
+    await blobs.update_one(
+        {"_id": stored["content_hash"]},
+        {"$setOnInsert": {"path": stored["blob"], "size_bytes": stored["size_bytes"],
+                          "refcount": 0, "refs": []}},
+        upsert=True,
+    )
+    await blobs.update_one(
+        {"_id": stored["content_hash"], "refs": {"$ne": ref_id}},
+        {"$addToSet": {"refs": ref_id}, "$inc": {"refcount": 1}},
+    )
+
+
+async def release(content_hash: str, ref_id: str) -> Optional[int]:
+    """Resta la referencia `ref_id`; si no quedan, borra el blob. Devuelve las restantes."""
+    blob = await _blobs().find_one_and_update(
+        {"_id": content_hash, "refs": ref_id},
+        {"$pull": {"refs": ref_id}, "$inc": {"refcount": -1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not blob:
+        return None
+    if blob["refcount"] > 0:
+        return blob["refcount"]
+
+    deleted = await _blobs().delete_one({"_id": content_hash, "refcount": {"$lte": 0}})
+    if deleted.deleted_count:
+        await run_io(_remove_blob, os.path.join(STORE_DIR, blob["path"]))
+    return 0
+
+
+def _remove_blob(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def remove_name(filename: str) -> None:
+    """Borra el nombre legible (el blob sigue vivo mientras tenga referencias)."""
+    path = os.path.join(DOWNLOAD_DIR, filename)
+    if os.path.lexists(path):
+        os.remove(path)
@@ -0,0 +1,360 @@
+"""
+app/services/range_downloader.py
+-------------------------------------------
+Descargador HTTP con varias conexiones y peticiones Range en paralelo.
+
+Los CDN de las plataformas suelen limitar la velocidad por conexión;
+repartiendo el archivo en rangos sobre varias conexiones keep-alive
+se aprovecha mucho mejor el enlace.
+
+- Sondea el servidor con "Range: bytes=0-0": si no responde 206 con el
+  tamaño total, lanza RangeNotSupported y el llamador usa yt-dlp.
+- Preasigna el archivo .part y cada hilo escribe sus bloques en su offset.
+- Cada hilo mantiene su propia conexión persistente. Los hilos salen del
+  pool "range" de app/core/executors.py, que limita las conexiones de
+  todo el proceso (RANGE_DOWNLOAD_MAX_CONNECTIONS), no por descarga.
+- Envía las cookies de yt-dlp (formato "cookies" de cada formato) solo a
+  los dominios a los que pertenecen, también tras una redirección.
+- El tamaño de bloque se adapta: apunta a que cada petición dure
+  ~target_chunk_seconds según el throughput medido.
+- Los rangos completos se guardan en "<archivo>.part.ranges" para poder
+  reanudar tras un reinicio sin volver a bajar lo ya escrito.
+
+Principales elementos:
+- RangeDownloader(url, dest, ...).download(): bloqueante (usar run_download).
+- RangeNotSupported, DownloadCancelled.
+"""
+
+import os
+import json
+import time
+import threading
+import http.client
+from concurrent.futures import wait
+from urllib.parse import urlsplit, urljoin
+from typing import Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.executors import get_executor
+
+_MB = 1024 * 1024
+_READ_SIZE = 256 * 1024
+_MAX_REDIRECTS = 5
+_MAX_RETRIES = 3
+_FLUSH_SECONDS = 2.0
+
+
+class RangeNotSupported(Exception):
+    """El servidor no admite peticiones Range (o no informa el tamaño)."""
+
+
+class DownloadCancelled(Exception):
+    """La descarga se canceló desde fuera (threading.Event)."""
+
+
+def _connect(url: str, timeout: float) -> http.client.HTTPConnection:
+    parts = urlsplit(url)
+    cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    return cls(parts.netloc, timeout=timeout)
+
+
+def _path(url: str) -> str:
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else "") or "/"
+
+
+_COOKIE_ATTRS = {"domain", "path", "secure", "expires", "version", "httponly", "max-age", "samesite"}
+
+
+def _parse_cookies(cookies: Optional[str]) -> List[Dict]:
+    """
+    Convierte el campo "cookies" de yt-dlp ("a=1; Domain=.x.com; Path=/;
+    Secure; b=2; ...") en una lista de cookies con sus atributos.
+    """
+    parsed: List[Dict] = []
+    for token in (cookies or "").split(";"):
+        name, _, value = token.strip().partition("=")
+        if not name:
+            continue
+        attr = name.lower()
+        if attr in _COOKIE_ATTRS and parsed:
+            parsed[-1][attr] = value or True
+        else:
+            parsed.append({"name": name, "value": value})
+    return parsed
+
+
+def _cookie_header(cookies: List[Dict], url: str) -> Optional[str]:
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    values = []
+    for c in cookies:
+        domain = str(c.get("domain") or "").lower().lstrip(".")
+        if domain and host != domain and not host.endswith(f".{domain}"):
+            continue
+        if c.get("secure") and parts.scheme != "https":
+            continue
+        if not (parts.path or "/").startswith(str(c.get("path") or "/")):
+            continue
+        values.append(f"{c['name']}={c['value']}")
+    return "; ".join(values) or None
+
+
+class RangeDownloader:
+    def __init__(self, url: str, dest: str, headers: Optional[Dict[str, str]] = None,
+                 connections: Optional[int] = None,
+                 min_chunk: Optional[int] = None, max_chunk: Optional[int] = None,
+                 initial_chunk: Optional[int] = None,
+                 target_chunk_seconds: Optional[float] = None,
+                 timeout: float = 30.0,
+                 on_progress: Optional[Callable[[Dict], None]] = None,
+                 cancelled: Optional[threading.Event] = None,
+                 cookies: Optional[str] = None):
+        self.url = url
+        self.dest = dest
+        self.tmp = f"{dest}.part"
+        self.ranges_file = f"{self.tmp}.ranges"
+        # Sin compresión: los offsets de Range deben ser bytes del archivo
+        self.headers = {**(headers or {}), "Accept-Encoding": "identity"}
+        self.headers.pop("Cookie", None)  # solo cookies con dominio (ver _headers)
+        self.cookies = _parse_cookies(cookies)
+        self.connections = connections or settings.RANGE_DOWNLOAD_CONNECTIONS
+        self.min_chunk = min_chunk or int(settings.RANGE_DOWNLOAD_MIN_CHUNK_MB * _MB)
+        self.max_chunk = max_chunk or int(settings.RANGE_DOWNLOAD_MAX_CHUNK_MB * _MB)
+        self.chunk_size = initial_chunk or int(settings.RANGE_DOWNLOAD_INITIAL_CHUNK_MB * _MB)
+        self.target_seconds = target_chunk_seconds or settings.RANGE_DOWNLOAD_TARGET_CHUNK_SECONDS
+        self.timeout = timeout
+        self.on_progress = on_progress
+        self.cancelled = cancelled or threading.Event()
+
+        self.total = 0
+        self.downloaded = 0
+        self._pending: List[List[int]] = []   # huecos [inicio, fin) por descargar
+        self._done: List[List[int]] = []      # rangos [inicio, fin) ya escritos
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._error: Optional[BaseException] = None
+
+    def _headers(self, url: str, **extra) -> Dict[str, str]:
+        headers = {**self.headers, **extra}
+        cookie = _cookie_header(self.cookies, url)
+        if cookie:
+            headers["Cookie"] = cookie
+        return headers
+
+    # === Sondeo ===
+
+    def _probe(self) -> None:
+        """Resuelve redirecciones y obtiene el tamaño total con un GET de 1 byte."""
+        url = self.url
+        for _ in range(_MAX_REDIRECTS + 1):
+            conn = _connect(url, self.timeout)
+            try:
+                conn.request("GET", _path(url), headers=self._headers(url, Range="bytes=0-0"))
+                resp = conn.getresponse()
+                resp.read()
+            finally:
+                conn.close()
+            if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location"):
+                url = urljoin(url, resp.getheader("Location"))
+                continue
+            content_range = resp.getheader("Content-Range") or ""
+            if resp.status != 206 or "/" not in content_range:
+                raise RangeNotSupported(f"HTTP {resp.status} sin Content-Range")
+            total = content_range.rsplit("/", 1)[1]
+            if not total.isdigit():
+                raise RangeNotSupported("Tamaño total desconocido")
+            self.url = url
+            self.total = int(total)
+            return
+        raise RangeNotSupported("Demasiadas redirecciones")
+
+    # === Estado de rangos (reanudación) ===
+
+    def _load_state(self) -> None:
+        done: List[List[int]] = []
+        if os.path.exists(self.tmp) and os.path.exists(self.ranges_file):
+            try:
+                with open(self.ranges_file, "r", encoding="utf-8") as fh:
+                    state = json.load(fh)
+                if state.get("total") == self.total:
+                    done = sorted([int(a), int(b)] for a, b in state.get("done", []))
+            except (ValueError, OSError):
+                done = []
+        self._done = done
+        self.downloaded = sum(b - a for a, b in done)
+
+        # Huecos = complemento de los rangos completos
+        pending, cursor = [], 0
+        for a, b in done:
+            if a > cursor:
+                pending.append([cursor, a])
+            cursor = max(cursor, b)
+        if cursor < self.total:
+            pending.append([cursor, self.total])
+        self._pending = pending
+
+    def _save_state(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_flush < _FLUSH_SECONDS:
+            return
+        self._last_flush = now
+        tmp = f"{self.ranges_file}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"total": self.total, "done": self._done}, fh)
+        os.replace(tmp, self.ranges_file)
+
+    def _mark_done(self, start: int, end: int) -> None:
+        # Insertar y fusionar rangos contiguos para que el estado no crezca
+        self._done.append([start, end])
+        self._done.sort()
+        merged = [self._done[0]]
+        for a, b in self._done[1:]:
+            if a <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], b)
+            else:
+                merged.append([a, b])
+        self._done = merged
+
+    # === Reparto de trabajo ===
+
+    def _take(self) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            if not self._pending or self._error or self.cancelled.is_set():
+                return None
+            hole = self._pending[0]
+            start = hole[0]
+            end = min(hole[1], start + self.chunk_size)
+            if end >= hole[1]:
+                self._pending.pop(0)
+            else:
+                hole[0] = end
+            return start, end
+
+    def _give_back(self, start: int, end: int) -> None:
+        with self._lock:
+            self._pending.insert(0, [start, end])
+
+    def _adapt(self, nbytes: int, elapsed: float) -> None:
+        """Ajusta el bloque para que cada petición dure ~target_seconds."""
+        if elapsed <= 0:
+            return
+        ideal = int(nbytes / elapsed * self.target_seconds)
+        with self._lock:
+            # Media móvil para no oscilar con una sola petición lenta
+            size = int(0.7 * self.chunk_size + 0.3 * ideal)
+            self.chunk_size = max(self.min_chunk, min(self.max_chunk, size))
+
+    def _report(self, status: str) -> None:
+        if self.on_progress:
+            self.on_progress({
+                "status": status,
+                "filename": self.dest,
+                "tmpfilename": self.tmp,
+                "downloaded_bytes": self.downloaded,
+                "total_bytes": self.total,
+            })
+
+    # === Hilos de descarga ===
+
+    def _fetch_range(self, conn: http.client.HTTPConnection, fh, start: int, end: int) -> int:
+        conn.request("GET", _path(self.url), headers=self._headers(self.url, Range=f"bytes={start}-{end - 1}"))
+        resp = conn.getresponse()
+        if resp.status != 206:
+            resp.read()
+            raise RangeNotSupported(f"HTTP {resp.status} en el rango {start}-{end - 1}")
+
+        offset = start
+        try:
+            while offset < end:
+                if self.cancelled.is_set():
+                    raise DownloadCancelled("Descarga cancelada")
+                block = resp.read(min(_READ_SIZE, end - offset))
+                if not block:
+                    raise http.client.IncompleteRead(b"", end - offset)
+                fh.seek(offset)
+                fh.write(block)
+                offset += len(block)
+                with self._lock:
+                    self.downloaded += len(block)
+                self._report("downloading")
+        except BaseException:
+            # El rango se reintenta completo: descontar lo ya contado
+            with self._lock:
+                self.downloaded -= offset - start
+            raise
+        return end - start
+
+    def _worker(self) -> None:
+        conn = _connect(self.url, self.timeout)
+        fh = open(self.tmp, "r+b")
+        try:
+            while True:
+                task = self._take()
+                if task is None:
+                    return
+                start, end = task
+                for attempt in range(_MAX_RETRIES):
+                    began = time.monotonic()
+                    try:
+                        self._fetch_range(conn, fh, start, end)
+                        break
+                    except (RangeNotSupported, DownloadCancelled):
+                        raise
+                    except (OSError, http.client.HTTPException):
+                        # Conexión caída (keep-alive cerrado, timeout): reconectar y reintentar
+                        conn.close()
+                        conn = _connect(self.url, self.timeout)
+                        if attempt == _MAX_RETRIES - 1:
+                            self._give_back(start, end)
+                            raise
+                self._adapt(end - start, time.monotonic() - began)
+                with self._lock:
+                    self._mark_done(start, end)
+                    self._save_state()
+        except BaseException as e:
+            with self._lock:
+                self._error = self._error or e
+        finally:
+            fh.close()
+            conn.close()
+
+    def download(self) -> int:
+        """Descarga el archivo completo en `dest`. Devuelve el tamaño en bytes."""
+        self._probe()
+        self._load_state()
+
+        # Preasignar el .part (sin rellenar: los huecos se escriben en su offset)
+        mode = "r+b" if os.path.exists(self.tmp) else "w+b"
+        with open(self.tmp, mode) as fh:
+            fh.truncate(self.total)
+        if hasattr(os, "posix_fallocate") and self.total:
+            fd = os.open(self.tmp, os.O_RDWR)
+            try:
+                os.posix_fallocate(fd, 0, self.total)
+            except OSError:
+                pass  # sistema de archivos sin soporte: basta con truncate
+            finally:
+                os.close(fd)
+
+        remaining = self.total - self.downloaded
+        workers = max(1, min(self.connections, -(-remaining // self.min_chunk) if remaining else 1))
+        # Que cada conexión tenga trabajo desde el primer bloque en archivos pequeños
+        self.chunk_size = max(self.min_chunk, min(self.chunk_size, -(-remaining // workers)))
+        # Conexiones del pool compartido: si está lleno, estas esperan turno
+        pool = get_executor("range")
+        wait([pool.submit(self._worker) for _ in range(workers)])
+
+        with self._lock:
+            self._save_state(force=True)
+        if self._error:
+            raise self._error
+        if self.cancelled.is_set() and self._pending:
+            raise DownloadCancelled("Descarga cancelada")
+        if self.downloaded < self.total or self._pending:
+            raise OSError(f"Descarga incompleta: {self.downloaded}/{self.total} bytes")
+
+        os.replace(self.tmp, self.dest)
+        if os.path.exists(self.ranges_file):
+            os.remove(self.ranges_file)
+        self._report("finished")
+        return self.total
@@ -0,0 +1,176 @@
+"""
+app/services/scheduler.py
+-------------------------------------------
+Planificador de trabajos de descarga con clases de prioridad y
+reparto justo entre clientes (weighted fair queuing).
+
+- Dos clases: "interactive" (trabajos cortos, p. ej. un MP3 de 10 s) y
+  "bulk" (4K, listas largas). Interactive siempre se despacha primero y
+  tiene SCHEDULER_INTERACTIVE_RESERVED slots que bulk nunca puede ocupar.
+- Dentro de cada clase, cada cliente avanza su propio reloj virtual en
+  coste/peso: un cliente con cincuenta trabajos no adelanta a los demás.
+- El coste se estima en el servidor con la duración y el tamaño que
+  extrajo get_video_info, así que a igual cuota sale antes el trabajo
+  más corto.
+- Un cliente sin trabajos en cola ni en curso se olvida: la memoria no
+  crece con cada identificador distinto.
+
+Uso:
+    async with scheduler.slot(client_id, priority, cost):
+        ...  # trabajo
+"""
+
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+from app.core.config import settings
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITY_CLASSES = (INTERACTIVE, BULK)
+
+_MB = 1024 * 1024
+
+
+def estimate_cost(duration: Optional[float], size_bytes: Optional[int], audio_only: bool) -> float:
+    """Coste estimado del trabajo en MB a descargar/procesar."""
+    if size_bytes:
+        return size_bytes / _MB
+    if duration:
+        rate = settings.SCHEDULER_AUDIO_MB_PER_SECOND if audio_only else settings.SCHEDULER_VIDEO_MB_PER_SECOND
+        return float(duration) * rate
+    return settings.SCHEDULER_DEFAULT_COST
+
+
+def classify(priority: Optional[str], cost: float) -> str:
+    """
+    Clase efectiva del trabajo. Sin prioridad explícita decide el coste;
+    "interactive" solo se respeta si el trabajo es realmente corto.
+    """
+    if priority == BULK:
+        return BULK
+    if cost <= settings.SCHEDULER_INTERACTIVE_MAX_COST:
+        return INTERACTIVE
+    return BULK
+
+
+class _Ticket:
+    __slots__ = ("client_id", "priority", "start", "finish", "future", "granted")
+
+    def __init__(self, client_id: str, priority: str, start: float, finish: float,
+                 future: asyncio.Future):
+        self.client_id = client_id
+        self.priority = priority
+        self.start = start
+        self.finish = finish
+        self.future = future
+        self.granted = False
+
+
+class _FairQueue:
+    """Cola WFQ de una clase: orden por etiqueta de fin virtual."""
+
+    def __init__(self):
+        self.heap: List[tuple] = []
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+        self.active: Dict[str, int] = {}  # trabajos en cola o en curso por cliente
+
+    def push(self, ticket: _Ticket, seq: int) -> None:
+        heapq.heappush(self.heap, (ticket.finish, seq, ticket))
+
+    def pop(self) -> Optional[_Ticket]:
+        while self.heap:
+            _, _, ticket = heapq.heappop(self.heap)
+            if not ticket.future.done():  # descartar los cancelados
+                self.virtual_time = max(self.virtual_time, ticket.start)
+                return ticket
+        return None
+
+    def forget(self, client_id: str) -> None:
+        """Un trabajo del cliente terminó (o se canceló)."""
+        remaining = self.active.get(client_id, 0) - 1
+        if remaining > 0:
+            self.active[client_id] = remaining
+        else:
+            self.active.pop(client_id, None)
+            self.last_finish.pop(client_id, None)
+
+    def __len__(self) -> int:
+        return sum(1 for _, _, t in self.heap if not t.future.done())
+
+
+class JobScheduler:
+    def __init__(self, max_concurrent: int, interactive_reserved: int,
+                 client_weights: Optional[Dict[str, float]] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.bulk_limit = max(1, self.max_concurrent - max(0, interactive_reserved))
+        self.client_weights = client_weights or {}
+        self._queues = {p: _FairQueue() for p in PRIORITY_CLASSES}
+        self._running = {p: 0 for p in PRIORITY_CLASSES}
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_settings(cls) -> "JobScheduler":
+        return cls(settings.SCHEDULER_MAX_CONCURRENT_JOBS,
+                   settings.SCHEDULER_INTERACTIVE_RESERVED,
+                   settings.SCHEDULER_CLIENT_WEIGHTS)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {p: {"running": self._running[p], "queued": len(self._queues[p])}
+                for p in PRIORITY_CLASSES}
+
+    def _enqueue(self, client_id: str, priority: str, cost: float) -> _Ticket:
+        queue = self._queues[priority]
+        weight = self.client_weights.get(client_id, 1.0) or 1.0
+        start = max(queue.virtual_time, queue.last_finish.get(client_id, 0.0))
+        finish = start + max(cost, 0.0) / weight
+        queue.last_finish[client_id] = finish
+        queue.active[client_id] = queue.active.get(client_id, 0) + 1
+
+        ticket = _Ticket(client_id, priority, start, finish, asyncio.get_running_loop().create_future())
+        queue.push(ticket, next(self._seq))
+        return ticket
+
+    def _dispatch(self) -> None:
+        while sum(self._running.values()) < self.max_concurrent:
+            ticket = self._queues[INTERACTIVE].pop()
+            if ticket is None and self._running[BULK] < self.bulk_limit:
+                ticket = self._queues[BULK].pop()
+            if ticket is None:
+                return
+            ticket.granted = True
+            self._running[ticket.priority] += 1
+            ticket.future.set_result(None)
+
+    def _release(self, ticket: _Ticket) -> None:
+        if ticket.granted:
+            ticket.granted = False
+            self._running[ticket.priority] -= 1
+        self._queues[ticket.priority].forget(ticket.client_id)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client_id: str, priority: str, cost: float):
+        """Espera turno según clase y cuota del cliente; libera el slot al salir."""
+        if priority not in PRIORITY_CLASSES:
+            priority = BULK
+        ticket = self._enqueue(client_id, priority, cost)
+        self._dispatch()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            # Cancelado en cola (o justo al recibir turno): devolver el slot
+            ticket.future.cancel()
+            self._release(ticket)
+            raise
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+
+# Instancia global del planificador (una por proceso/worker)
+scheduler = JobScheduler.from_settings()
@@ -7,18 +7,24 @@ y gestión de videos mediante yt-dlp y FFmpeg.
 Funciones principales:
 - process_video(url, format, quality): descarga y convierte el video.
 - list_videos_db(): obtiene los registros guardados.
-- delete_video_db(video_id): elimina el video del sistema y la base de datos.
+- delete_video_db(video_id): elimina el video de la base de datos y resta
+  una referencia a su blob (app/services/media_store.py).
+
+yt-dlp y las operaciones de disco corren en los pools de
+app/core/executors.py para no bloquear el event loop.
 """
 
 import os
-import asyncio
+import uuid
 import datetime
 import yt_dlp
-import subprocess
 from bson import ObjectId
-from app.database.connection import db
+from app.database import connection
 from app.core.config import settings
 from app.models.video_model import VideoModel
+from app.core.executors import run_extract, run_download, run_io
+from app.services.ffmpeg_runner import run_ffmpeg, FFmpegError
+from app.services import media_store
 
 
 #  CONFIGURACIÓN GENERAL
@@ -27,6 +33,11 @@ DOWNLOAD_DIR = os.path.join(os.getcwd(), "downloads")
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
 
+def _remove_if_exists(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
 #  FUNCIÓN PRINCIPAL
 
 async def process_video(url, format="mp4", quality="1080p"):
@@ -50,13 +61,17 @@ async def process_video(url, format="mp4", quality="1080p"):
         # === Extraer metadatos del video ===
         ydl_opts_info = {"quiet": True, "skip_download": True}
 
-        with yt_dlp.YoutubeDL(ydl_opts_info) as ydl:
-            info = ydl.extract_info(url, download=False)
-            title = info.get("title", "video_sin_titulo").replace("/", "_")
-            ext = info.get("ext", "mp4")
-            platform = info.get("extractor_key", "desconocida")
+        def _extract():
+            with yt_dlp.YoutubeDL(ydl_opts_info) as ydl:
+                return ydl.extract_info(url, download=False)
 
-        filename = f"{title}.{ext}"
+        info = await run_extract(_extract)
+        title = info.get("title", "video_sin_titulo").replace("/", "_")
+        ext = info.get("ext", "mp4")
+        platform = info.get("extractor_key", "desconocida")
+
+        # Nombre temporal: el nombre legible lo asigna el almacén al final
+        filename = f"temp_{uuid.uuid4().hex}.{ext}"
         filepath = os.path.join(DOWNLOAD_DIR, filename)
 
         # === Configurar opciones de descarga ===
@@ -68,43 +83,41 @@ async def process_video(url, format="mp4", quality="1080p"):
         }
 
         # === Descargar el video con yt-dlp ===
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
+        def _download():
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                ydl.download([url])
+
+        await run_download(_download)
 
         # === Si el formato solicitado no coincide, convertir con ffmpeg ===
         if format and not filename.endswith(format):
-            converted_filename = f"{title}.{format}"
+            converted_filename = f"{os.path.splitext(filename)[0]}.{format}"
             converted_filepath = os.path.join(DOWNLOAD_DIR, converted_filename)
 
             # Comando limpio y compatible:
-            command = [
-                "ffmpeg",
-                "-i", filepath,
-                "-vn" if format == "mp3" else "-c:v", "libx264",
-                "-c:a", "aac",
-                "-strict", "experimental",
-                converted_filepath,
-                "-y"
-            ]
-
-            process = await asyncio.create_subprocess_exec(
-                *command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-
-            if process.returncode != 0:
-                print("Error en FFmpeg:", stderr.decode())
+            if format == "mp3":
+                codec_args = ["-vn", "-c:a", "libmp3lame"]
+            else:
+                codec_args = ["-c:v", "libx264", "-c:a", "aac"]
+            command = ["-y", "-i", filepath, *codec_args, converted_filepath]
+
+            # ffmpeg_runner aplica timeouts y límites, y mata FFmpeg si se cancela
+            try:
+                await run_ffmpeg(command)
+            except FFmpegError as e:
+                print("Error en FFmpeg:", e.stderr or str(e))
                 return {"message": "Error en la conversión de video"}
             
             # Eliminar el archivo original si se creó la conversión
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            await run_io(_remove_if_exists, filepath)
 
             filepath = converted_filepath
             filename = converted_filename
 
+        # === Guardar en el almacén por contenido (deduplicado) ===
+        stored = await run_io(media_store.ingest, filepath, f"{title}{os.path.splitext(filename)[1]}")
+        filename = stored["filename"]
+
         # === Guardar metadatos en MongoDB ===
         video_doc = VideoModel(
             title=title,
@@ -113,10 +126,13 @@ async def process_video(url, format="mp4", quality="1080p"):
             quality=quality,
             platform=platform,
             download_url=f"/downloads/{filename}",
+            content_hash=stored["content_hash"],
+            size_bytes=stored["size_bytes"],
             created_at=datetime.datetime.utcnow(),
         )
 
-        await db["videos"].insert_one(video_doc.model_dump(by_alias=True))
+        inserted = await connection.db["videos"].insert_one(video_doc.model_dump(by_alias=True, exclude_none=True))
+        await media_store.add_reference(stored, str(inserted.inserted_id))
         print(f" Video procesado y guardado: {filename}")
         return {"message": "Video procesado correctamente", "filename": filename}
 
@@ -130,10 +146,10 @@ async def list_videos_db():
     """
     Devuelve una lista de todos los videos registrados en MongoDB.
     """
-    videos_cursor = db["videos"].find().sort("created_at", -1)
+    videos_cursor = connection.db["videos"].find().sort("created_at", -1)
     videos = []
     async for video in videos_cursor:
-        video["_id"] = str(video["_id"])
+        video["id"] = str(video.pop("_id"))
         videos.append(video)
     return videos
 
@@ -142,15 +158,20 @@ async def list_videos_db():
 
 async def delete_video_db(video_id: str):
     """
-    Elimina un video de la base de datos y su archivo del disco.
+    Elimina un video de la base de datos y resta una referencia a su blob.
+    El nombre legible se borra cuando ningún otro video lo usa; el blob,
+    cuando su conteo de referencias llega a 0.
     """
-    video = await db["videos"].find_one({"_id": ObjectId(video_id)})
+    videos = connection.db["videos"]
+    video = await videos.find_one({"_id": ObjectId(video_id)})
     if not video:
         return False
 
-    filepath = os.path.join(DOWNLOAD_DIR, video["filename"])
-    if os.path.exists(filepath):
-        os.remove(filepath)
+    await videos.delete_one({"_id": ObjectId(video_id)})
 
-    await db["videos"].delete_one({"_id": ObjectId(video_id)})
+    if not await videos.count_documents({"filename": video["filename"]}):
+        await run_io(media_store.remove_name, video["filename"])
+    if video.get("content_hash"):
+        # La referencia es el trabajo que lo generó o, si no hubo, el propio documento
+        await media_store.release(video["content_hash"], video.get("job_id") or str(video["_id"]))
     return True
@@ -0,0 +1,205 @@
+"""
+scripts/bench_range_download.py
+-------------------------------------------
+Benchmark de app/services/range_downloader.py contra un servidor HTTP
+local con soporte de Range y límite de velocidad por conexión (como
+hacen los CDN de las plataformas).
+
+Compara una sola conexión (equivalente al descargador de yt-dlp) contra
+varias conexiones en paralelo, verifica el SHA-256 del resultado y
+comprueba la reanudación (descarga interrumpida a mitad), el tope de
+conexiones del proceso con varias descargas a la vez y el fallback
+(servidor sin Range → RangeNotSupported).
+
+Ejemplos (desde backend/):
+    python scripts/bench_range_download.py
+    python scripts/bench_range_download.py --size-mb 64 --conn-kbps 4096 --connections 1,4,8
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+_BLOCK = 64 * 1024
+
+
+class _Active:
+    """Peticiones en curso en el servidor (y el máximo observado)."""
+    lock = threading.Lock()
+    now = 0
+    peak = 0
+
+
+def make_handler(payload: bytes, conn_kbps: float, ranges: bool):
+    """Handler que sirve `payload` en /file limitando cada conexión a conn_kbps."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            # El sondeo de 1 byte va por el hilo de la descarga: solo cuentan los rangos de datos
+            counted = self.headers.get("Range") != "bytes=0-0"
+            if counted:
+                with _Active.lock:
+                    _Active.now += 1
+                    _Active.peak = max(_Active.peak, _Active.now)
+            try:
+                self._send()
+            finally:
+                if counted:
+                    with _Active.lock:
+                        _Active.now -= 1
+
+        def _send(self):
+            total = len(payload)
+            start, end = 0, total - 1
+            header = self.headers.get("Range")
+            if ranges and header and header.startswith("bytes="):
+                first, _, last = header[6:].partition("-")
+                start = int(first)
+                end = min(int(last), total - 1) if last else total - 1
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{total}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes" if ranges else "none")
+            self.end_headers()
+
+            delay = _BLOCK / (conn_kbps * 1024) if conn_kbps else 0
+            offset = start
+            try:
+                while offset <= end:
+                    if delay:
+                        time.sleep(delay)
+                    block = payload[offset:min(offset + _BLOCK, end + 1)]
+                    self.wfile.write(block)
+                    offset += len(block)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return Handler
+
+
+def serve(payload: bytes, conn_kbps: float, ranges: bool = True) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(payload, conn_kbps, ranges))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def run(url: str, dest: str, connections: int, **kwargs):
+    from app.services.range_downloader import RangeDownloader
+    if os.path.exists(dest):
+        os.remove(dest)
+    downloader = RangeDownloader(url, dest, connections=connections, **kwargs)
+    started = time.perf_counter()
+    downloader.download()
+    return time.perf_counter() - started, downloader
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del descargador por rangos")
+    parser.add_argument("--size-mb", type=float, default=32)
+    parser.add_argument("--conn-kbps", type=float, default=2048,
+                        help="Límite por conexión del servidor (0 = sin límite)")
+    parser.add_argument("--connections", default="1,2,4,8")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("MONGODB_DB_NAME", "link2video_bench")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app.services.range_downloader import RangeNotSupported, DownloadCancelled
+
+    payload = os.urandom(int(args.size_mb * 1024 * 1024))
+    expected = hashlib.sha256(payload).hexdigest()
+    server = serve(payload, args.conn_kbps)
+    url = f"http://127.0.0.1:{server.server_port}/file"
+    workdir = tempfile.mkdtemp(prefix="link2video-bench-")
+    dest = os.path.join(workdir, "out.bin")
+    ok = True
+
+    print(f"Archivo: {args.size_mb:.0f} MB · límite por conexión: {args.conn_kbps:.0f} KB/s")
+    print(f"{'conexiones':>10} {'segundos':>9} {'MB/s':>8} {'speedup':>8} {'bloque final':>13}  sha256")
+    baseline = None
+    for n in [int(c) for c in args.connections.split(",")]:
+        elapsed, downloader = run(url, dest, n)
+        baseline = baseline or elapsed
+        valid = sha256(dest) == expected
+        ok &= valid
+        print(f"{n:>10} {elapsed:>9.2f} {args.size_mb / elapsed:>8.2f} {baseline / elapsed:>7.1f}x "
+              f"{downloader.chunk_size / 1024 / 1024:>10.1f} MB  {'ok' if valid else 'DISTINTO'}")
+
+    # Reanudación: cancelar a mitad y continuar con el sidecar .part.ranges
+    os.remove(dest)
+    cancelled = threading.Event()
+
+    def _cancel_at_half(d):
+        if d["downloaded_bytes"] >= len(payload) // 2:
+            cancelled.set()
+
+    try:
+        run(url, dest, 4, on_progress=_cancel_at_half, cancelled=cancelled,
+            initial_chunk=1024 * 1024, min_chunk=256 * 1024)
+    except DownloadCancelled:
+        pass
+    with open(f"{dest}.part.ranges", "r", encoding="utf-8") as fh:
+        kept = sum(b - a for a, b in json.load(fh)["done"])
+    run(url, dest, 4)
+    valid = sha256(dest) == expected
+    ok &= valid
+    print(f"Reanudación: {'ok' if valid else 'DISTINTO'} "
+          f"({kept / 1024 / 1024:.1f} MB conservados del intento cancelado)")
+
+    # Tope del proceso: varias descargas a la vez comparten el pool "range"
+    from app.core.config import settings
+    time.sleep(1)  # que terminen las respuestas del intento cancelado
+    _Active.peak = 0
+    dests = [os.path.join(workdir, f"c{i}.bin") for i in range(3)]
+    threads = [threading.Thread(target=run, args=(url, d, 8)) for d in dests]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    valid = all(sha256(d) == expected for d in dests)
+    capped = _Active.peak <= settings.RANGE_DOWNLOAD_MAX_CONNECTIONS
+    ok &= valid and capped
+    print(f"Tope de conexiones: {'ok' if valid and capped else 'ERROR'} "
+          f"(3 descargas × 8 → máx. {_Active.peak} simultáneas, "
+          f"tope {settings.RANGE_DOWNLOAD_MAX_CONNECTIONS})")
+
+    # Fallback: servidor sin Range
+    plain = serve(payload, 0, ranges=False)
+    try:
+        run(f"http://127.0.0.1:{plain.server_port}/file", dest, 4)
+        print("Fallback: ERROR, se esperaba RangeNotSupported")
+        ok = False
+    except RangeNotSupported as e:
+        print(f"Fallback: ok (RangeNotSupported: {e})")
+
+    server.shutdown()
+    plain.shutdown()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,522 @@
+"""
+scripts/load_test.py
+-------------------------------------------
+Prueba de carga de la API (routers de info, descarga y videos) con
+yt-dlp, FFmpeg y MongoDB simulados, y reporte de SLOs de latencia.
+
+Modos:
+- En proceso (por defecto): la app ASGI corre en el mismo event loop que
+  el generador de carga (httpx.ASGITransport). Se mide además el retraso
+  del event loop y se activa app/core/loop_monitor.py, que indica el punto
+  de llamada de cualquier callback que bloquee el loop.
+- --serve: levanta la app con los mismos stubs en un servidor uvicorn local,
+  para cargarla desde otro proceso con --base-url.
+- --base-url URL: genera carga contra un servidor ya levantado.
+
+Limitación del modo en proceso: ASGITransport espera a que la app termine
+la petición completa, incluidas las BackgroundTasks. El endpoint "process"
+responde 202 y hace el trabajo en segundo plano, así que en proceso su
+latencia es la del trabajo entero; para medir la respuesta usar --base-url.
+
+La carga sube por etapas de concurrencia (--stages 1,5,10,25) y por cada
+etapa y endpoint se registran throughput, tasa de errores y percentiles
+de latencia. Si algún SLO (--slo) no se cumple el proceso termina con 1.
+
+Ejemplos (desde backend/):
+    python scripts/load_test.py --stages 1,10,50 --stage-seconds 5
+    python scripts/load_test.py --mix info=1 --slo info:p99=300 --slo *:error_rate=0.01
+    python scripts/load_test.py --serve --port 8001
+    python scripts/load_test.py --base-url http://127.0.0.1:8001 --report report.json
+
+Requiere httpx (y uvicorn para --serve): pip install httpx
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import itertools
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Endpoints disponibles: nombre → (método, ruta, generador de body)
+_counter = itertools.count()
+
+
+def _url() -> str:
+    return f"https://www.youtube.com/watch?v=load{next(_counter)}"
+
+
+ENDPOINTS = {
+    "info": ("POST", "/api/video/info", lambda: {"url": _url()}),
+    "download": ("POST", "/api/video/download", lambda: {"url": _url(), "format": "mp3", "duration": 10}),
+    "download_video": ("POST", "/api/video/download", lambda: {"url": _url(), "format": "mp4", "quality": "720p"}),
+    "list": ("GET", "/api/video/jobs/list", None),
+    "process": ("POST", "/api/video/jobs/download", lambda: {"url": _url(), "format": "mp4"}),
+}
+
+
+# === STUBS: yt-dlp ===
+
+class StubLatency:
+    extract_ms = 50.0    # bloqueante (time.sleep), como la red dentro de yt-dlp
+    download_ms = 100.0  # bloqueante
+    ffmpeg_ms = 50.0     # asíncrono (subproceso)
+
+
+def _fake_info(url: str) -> Dict:
+    vid = url.rsplit("=", 1)[-1]
+    formats = [
+        {"format_id": "140", "ext": "m4a", "acodec": "mp4a.40.2", "vcodec": "none", "tbr": 129, "filesize": 160_000},
+        {"format_id": "251", "ext": "webm", "acodec": "opus", "vcodec": "none", "tbr": 135, "filesize": 170_000},
+        {"format_id": "136", "ext": "mp4", "acodec": "none", "vcodec": "avc1.4d401f", "height": 720, "fps": 30, "filesize": 2_000_000},
+        {"format_id": "137", "ext": "mp4", "acodec": "none", "vcodec": "avc1.640028", "height": 1080, "fps": 30, "filesize": 4_000_000},
+    ]
+    for f in formats:
+        f["url"] = f"https://cdn.example/{vid}/{f['format_id']}"
+        f["protocol"] = "https"
+    return {
+        "id": vid, "title": f"Video {vid}", "thumbnail": None, "duration": 10,
+        "uploader": "Load Test", "extractor_key": "Youtube", "webpage_url": url,
+        "formats": formats,
+    }
+
+
+class FakeYoutubeDL:
+    """Sustituto mínimo de yt_dlp.YoutubeDL con latencias configurables."""
+
+    def __init__(self, params: Optional[Dict] = None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _select(self, info: Dict) -> Dict:
+        fmt = str(self.params.get("format") or "")
+        by_id = {f["format_id"]: f for f in info["formats"]}
+        first = fmt.split("/")[0]
+        if first in by_id:
+            return dict(info, **by_id[first])
+        if "+" in first and all(p in by_id for p in first.split("+")):
+            parts = [by_id[p] for p in first.split("+")]
+            return dict(info, format_id=first, requested_formats=parts)
+        if fmt.startswith("bestaudio"):
+            return dict(info, **by_id["140"])
+        return dict(info, format_id="136+140", requested_formats=[by_id["136"], by_id["140"]], ext="mp4")
+
+    def extract_info(self, url: str, download: bool = True) -> Dict:
+        time.sleep(StubLatency.extract_ms / 1000)
+        info = self._select(_fake_info(url))
+        return self.process_ie_result(info, download=True) if download else info
+
+    def process_ie_result(self, info: Dict, download: bool = True) -> Dict:
+        info = self._select(info)
+        # Como yt-dlp: un requested_formats ya presente en `info` se respeta y lleva a
+        # la rama de fusión, que pide las URLs unidas por "\n"; si no es la selección
+        # de este formato, el CDN responde 404
+        parts = info.get("requested_formats")
+        if download and not self.params.get("skip_download") and parts \
+                and info["format_id"] != "+".join(f["format_id"] for f in parts):
+            from yt_dlp.utils import DownloadError
+            raise DownloadError("ERROR: unable to download video data: HTTP Error 404: Not Found")
+        time.sleep(StubLatency.download_ms / 1000)
+        path = str(self.params.get("outtmpl", "%(id)s.%(ext)s")).replace("%(ext)s", info.get("ext", "mp4"))
+        path = path.replace("%(id)s", info["id"])
+        with open(path, "wb") as fh:
+            fh.write(os.urandom(1024))
+        for hook in self.params.get("progress_hooks", []):
+            hook({"status": "finished", "filename": path, "tmpfilename": path, "downloaded_bytes": 1024})
+        return dict(info, requested_downloads=[{"filepath": path}], filepath=path)
+
+    def download(self, urls: List[str]) -> int:
+        for url in urls:
+            self.extract_info(url, download=True)
+        return 0
+
+
+# === STUBS: FFmpeg ===
+
+async def fake_run_ffmpeg(args: List[str], ffmpeg_path: Optional[str] = None, **kwargs) -> str:
+    await asyncio.sleep(StubLatency.ffmpeg_ms / 1000)
+    out = args[-1]
+    if out not in ("-", "pipe:1"):
+        with open(out, "wb") as fh:
+            fh.write(os.urandom(1024))
+    # Salida mínima para la medición de loudnorm
+    return ('{"input_i": "-20", "input_tp": "-3", "input_lra": "5", '
+            '"input_thresh": "-30", "target_offset": "0"}')
+
+
+# === STUBS: MongoDB (motor) ===
+
+def _matches(doc: Dict, query: Dict) -> bool:
+    for key, cond in query.items():
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            for op, arg in cond.items():
+                if op == "$in" and value not in arg:
+                    return False
+                if op == "$ne" and (arg in value if isinstance(value, list) else value == arg):
+                    return False
+                if op == "$lt" and not (value is not None and value < arg):
+                    return False
+                if op == "$lte" and not (value is not None and value <= arg):
+                    return False
+                if op == "$gt" and not (value is not None and value > arg):
+                    return False
+        elif isinstance(value, list):
+            if cond not in value:  # como Mongo: un valor escalar busca dentro del array
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _apply_update(doc: Dict, update: Dict) -> None:
+    for key, value in update.get("$set", {}).items():
+        doc[key] = value
+    for key, value in update.get("$inc", {}).items():
+        doc[key] = doc.get(key, 0) + value
+    for key, value in update.get("$addToSet", {}).items():
+        doc.setdefault(key, [])
+        if value not in doc[key]:
+            doc[key].append(value)
+    for key, value in update.get("$pull", {}).items():
+        doc[key] = [v for v in doc.get(key, []) if v != value]
+
+
+class _Result:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict]):
+        self._docs = docs
+
+    def sort(self, key: str, direction: int = 1):
+        self._docs.sort(key=lambda d: (d.get(key) is None, d.get(key)), reverse=direction < 0)
+        return self
+
+    def __aiter__(self):
+        self._it = iter(self._docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return dict(next(self._it))
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs: Dict = {}
+
+    async def insert_one(self, doc: Dict):
+        from bson import ObjectId
+        doc = dict(doc)
+        doc["_id"] = doc.get("_id") or ObjectId()
+        self.docs[doc["_id"]] = doc
+        return _Result(inserted_id=doc["_id"])
+
+    def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None):
+        return FakeCursor([d for d in self.docs.values() if _matches(d, query or {})])
+
+    async def find_one(self, query: Dict):
+        return next((dict(d) for d in self.docs.values() if _matches(d, query)), None)
+
+    async def update_one(self, query: Dict, update: Dict, upsert: bool = False):
+        for d in self.docs.values():
+            if _matches(d, query):
+                _apply_update(d, update)
+                return _Result(matched_count=1, modified_count=1)
+        if upsert:
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            _apply_update(doc, {"$set": update.get("$setOnInsert", {}), **update})
+            await self.insert_one(doc)
+        return _Result(matched_count=0, modified_count=0)
+
+    async def count_documents(self, query: Dict) -> int:
+        return sum(1 for d in self.docs.values() if _matches(d, query))
+
+    async def find_one_and_update(self, query: Dict, update: Dict, **kwargs):
+        for d in self.docs.values():
+            if _matches(d, query):
+                _apply_update(d, update)
+                return dict(d)
+        return None
+
+    async def delete_one(self, query: Dict):
+        for key, d in list(self.docs.items()):
+            if _matches(d, query):
+                del self.docs[key]
+                return _Result(deleted_count=1)
+        return _Result(deleted_count=0)
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name: str) -> FakeCollection:
+        self[name] = FakeCollection()
+        return self[name]
+
+
+# === APP CON STUBS ===
+
+def build_app(mongo_url: Optional[str] = None):
+    """
+    Importa la app con yt-dlp/FFmpeg simulados en un directorio temporal.
+    Con mongo_url usa un mongod real (p. ej. local); si no, un Mongo en memoria.
+    """
+    os.chdir(tempfile.mkdtemp(prefix="link2video-load-"))
+    os.makedirs("downloads", exist_ok=True)
+    if mongo_url:
+        os.environ["MONGODB_URL"] = mongo_url
+    else:
+        os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("MONGODB_DB_NAME", "link2video_loadtest")
+    # Las URLs de los formatos simulados no existen: descarga solo vía FakeYoutubeDL
+    os.environ.setdefault("RANGE_DOWNLOAD_ENABLED", "false")
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import yt_dlp
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+
+    from app import main
+    from app.database import connection
+    from app.routers import video_router
+    from app.services import ffmpeg_runner, video_service
+
+    ffmpeg_runner.run_ffmpeg = fake_run_ffmpeg
+    ffmpeg_runner.find_ffmpeg = lambda: "ffmpeg-stub"
+    video_service.run_ffmpeg = fake_run_ffmpeg
+
+    if not mongo_url:
+        fake_db = FakeDatabase()
+
+        async def _fake_connect():
+            connection.db = fake_db
+
+        connection.db = fake_db
+        main.connect_to_mongo = _fake_connect
+
+    # video_router no está registrado en main: se monta aparte para poder medirlo
+    main.app.include_router(video_router.router, prefix="/api/video/jobs", tags=["Video"])
+    return main.app
+
+
+# === GENERADOR DE CARGA ===
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def _summarize(samples: List[tuple], elapsed: float) -> Dict:
+    latencies = [s[1] for s in samples]
+    errors = sum(1 for s in samples if not s[2])
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "p50": round(_percentile(latencies, 50), 1),
+        "p90": round(_percentile(latencies, 90), 1),
+        "p99": round(_percentile(latencies, 99), 1),
+        "max": round(max(latencies), 1) if latencies else 0.0,
+    }
+
+
+async def _loop_lag_probe(samples: List[float], interval: float = 0.01) -> None:
+    # Cuánto se retrasa un sleep corto: si el loop se bloquea, el retraso crece
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def _worker(client, names: List[str], weights: List[float], deadline: float,
+                  samples: List[tuple], timeout: float) -> None:
+    while time.perf_counter() < deadline:
+        name = random.choices(names, weights)[0]
+        method, path, body = ENDPOINTS[name]
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, path, json=body() if body else None, timeout=timeout)
+            ok = resp.status_code < 400
+        except Exception:
+            ok = False
+        samples.append((name, (time.perf_counter() - start) * 1000, ok))
+
+
+async def run_load(client, stages: List[int], stage_seconds: float, mix: Dict[str, float],
+                   timeout: float, measure_loop: bool) -> List[Dict]:
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    report = []
+    for concurrency in stages:
+        samples: List[tuple] = []
+        lag: List[float] = []
+        probe = asyncio.create_task(_loop_lag_probe(lag)) if measure_loop else None
+        start = time.perf_counter()
+        deadline = start + stage_seconds
+        await asyncio.gather(*[
+            _worker(client, names, weights, deadline, samples, timeout) for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+        if probe:
+            probe.cancel()
+
+        stage = {
+            "concurrency": concurrency,
+            "elapsed_s": round(elapsed, 2),
+            "total": _summarize(samples, elapsed),
+            "endpoints": {n: _summarize([s for s in samples if s[0] == n], elapsed) for n in names},
+        }
+        if measure_loop:
+            stage["loop_lag_ms"] = {"p99": round(_percentile(lag, 99), 1), "max": round(max(lag or [0]), 1)}
+        report.append(stage)
+        _print_stage(stage)
+    return report
+
+
+def _print_stage(stage: Dict) -> None:
+    print(f"\n== concurrencia {stage['concurrency']} ({stage['elapsed_s']}s) ==")
+    print(f"{'endpoint':<16}{'req':>7}{'rps':>9}{'err%':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    rows = dict(stage["endpoints"], total=stage["total"])
+    for name, s in rows.items():
+        print(f"{name:<16}{s['requests']:>7}{s['throughput_rps']:>9}{s['error_rate'] * 100:>7.1f}%"
+              f"{s['p50']:>9}{s['p90']:>9}{s['p99']:>9}{s['max']:>9}")
+    if "loop_lag_ms" in stage:
+        print(f"event loop lag: p99={stage['loop_lag_ms']['p99']}ms max={stage['loop_lag_ms']['max']}ms")
+
+
+# === SLOs ===
+
+def parse_slo(spec: str) -> tuple:
+    """'info:p99=300' → ('info', 'p99', 300.0). '*' aplica al total."""
+    target, _, rule = spec.partition(":")
+    metric, _, limit = rule.partition("=")
+    if not target or metric not in ("p50", "p90", "p99", "max", "error_rate") or not limit:
+        raise argparse.ArgumentTypeError(f"SLO inválido: {spec!r} (ej: info:p99=300, *:error_rate=0.01)")
+    return target, metric, float(limit)
+
+
+def check_slos(report: List[Dict], slos: List[tuple]) -> List[str]:
+    violations = []
+    for stage in report:
+        for target, metric, limit in slos:
+            summary = stage["total"] if target == "*" else stage["endpoints"].get(target)
+            if not summary or not summary["requests"]:
+                continue
+            if summary[metric] > limit:
+                violations.append(f"concurrencia {stage['concurrency']}: {target} {metric}="
+                                  f"{summary[metric]} > {limit}")
+    return violations
+
+
+def _parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Endpoint desconocido: {name} (opciones: {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API Link2Video")
+    parser.add_argument("--base-url", help="Servidor ya levantado (si no, la app corre en proceso)")
+    parser.add_argument("--serve", action="store_true", help="Levantar la app con stubs en uvicorn")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--mongo-url", help="Usar un mongod real (p. ej. mongodb://localhost:27017)")
+    parser.add_argument("--stages", default="1,5,10,25", help="Concurrencias por etapa")
+    parser.add_argument("--stage-seconds", type=float, default=5.0)
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix("info=5,download=2,list=2,process=1"))
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por petición (s)")
+    parser.add_argument("--extract-ms", type=float, default=StubLatency.extract_ms)
+    parser.add_argument("--download-ms", type=float, default=StubLatency.download_ms)
+    parser.add_argument("--ffmpeg-ms", type=float, default=StubLatency.ffmpeg_ms)
+    parser.add_argument("--slo", type=parse_slo, action="append", default=[],
+                        help="Umbral endpoint:métrica=valor (ms o fracción para error_rate)")
+    parser.add_argument("--report", help="Guardar el reporte en JSON")
+    args = parser.parse_args(argv)
+
+    if args.report:
+        # build_app cambia el directorio de trabajo
+        args.report = os.path.abspath(args.report)
+
+    StubLatency.extract_ms = args.extract_ms
+    StubLatency.download_ms = args.download_ms
+    StubLatency.ffmpeg_ms = args.ffmpeg_ms
+
+    if args.serve:
+        import uvicorn
+        uvicorn.run(build_app(args.mongo_url), host="127.0.0.1", port=args.port)
+        return 0
+
+    try:
+        import httpx
+    except ImportError:
+        print("Se necesita httpx: pip install httpx")
+        return 2
+
+    stages = [int(c) for c in args.stages.split(",") if c.strip()]
+
+    async def _run() -> List[Dict]:
+        if args.base_url:
+            client = httpx.AsyncClient(base_url=args.base_url)
+        else:
+            transport = httpx.ASGITransport(app=build_app(args.mongo_url))
+            client = httpx.AsyncClient(transport=transport, base_url="http://loadtest")
+            # ASGITransport no ejecuta el startup: conectar Mongo y activar el monitor a mano
+            from app.database import connection
+            from app.core.loop_monitor import loop_monitor
+            if args.mongo_url:
+                await connection.connect_to_mongo()
+            loop_monitor.start()
+            if "process" in args.mix:
+                print("ℹ️ En proceso, 'process' incluye su tarea de fondo (extract + download + "
+                      "ffmpeg): su latencia no es la de la respuesta 202. Medir con --base-url.")
+        try:
+            async with client:
+                return await run_load(client, stages, args.stage_seconds, args.mix,
+                                      args.timeout, measure_loop=not args.base_url)
+        finally:
+            if not args.base_url:
+                loop_monitor.stop()
+                if args.mongo_url:
+                    await connection.close_mongo_connection()
+
+    report = asyncio.run(_run())
+    violations = check_slos(report, args.slo)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump({"stages": report, "slos": [list(s) for s in args.slo],
+                       "violations": violations}, fh, indent=2)
+
+    if violations:
+        print("\n❌ SLOs incumplidos:")
+        for v in violations:
+            print(f"  - {v}")
+        return 1
+    print("\n✅ Todos los SLOs se cumplen" if args.slo else "\nSin SLOs configurados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
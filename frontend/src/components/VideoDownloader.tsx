@@ -84,6 +84,8 @@ const VideoDownloader = () => {
         url: videoUrl,
         format: format.ext || format.format || "mp4", // Asegurar fallback
         quality: format.quality || "720p",
+        duration: Number(videoInfo?.duration) || undefined,
+        size_bytes: format.size_bytes || format.filesize,
       });
 
       // 2. Creamos una URL temporal para el Blob
@@ -23,6 +23,9 @@ export interface DownloadPayload {
   url: string;
   format: string;
   quality: string;
+  // Pistas para el planificador del backend (prioriza trabajos cortos)
+  duration?: number;
+  size_bytes?: number;
 }
 
 
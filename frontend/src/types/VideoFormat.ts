@@ -26,5 +26,6 @@ export interface VideoFormat {
   // Ambos
   quality?: string;
   filesize?: number;
+  size_bytes?: number;
   type: "video" | "audio";
 }